@@ -0,0 +1,402 @@
+import os
+import sys
+import subprocess
+from time import perf_counter
+from typing import Callable, Dict, List
+
+# the game loads its assets relative to src/ and needs a display, a dummy one is enough here
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+SRC_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "src")
+sys.path.insert(0, SRC_PATH)
+
+import pygame
+from pytmx.util_pygame import load_pygame
+from settings import *
+
+
+def setup() -> None:
+    os.chdir(SRC_PATH)
+    pygame.init()
+    pygame.display.set_mode((WINDOW_WIDTH, WINDOW_HEIGHT))
+
+
+def collision_rects() -> None:
+    from collision import SolidMap
+
+    levels_path = os.path.join('..', 'data', 'levels')
+    for file_name in sorted(os.listdir(levels_path)):
+        tmx_map = load_pygame(os.path.join(levels_path, file_name))
+        solid_map = SolidMap(tmx_map.width, tmx_map.height)
+        for x, y, _ in tmx_map.get_layer_by_name('Terrain').tiles():
+            solid_map.add_tile(x, y)
+        tiles = sum(solid_map.tiles)
+        rects = len(solid_map.merge_rects())
+        print(f"{file_name:<10} {tiles:>5} tile rects -> {rects:>4} merged rects")
+
+
+def rotation(frames: int = 10000, hats: int = 8) -> None:
+    from transforms import rotate
+    from support import import_folder
+
+    surf = import_folder('..', 'graphics', 'player', 'idle_hat')[0]
+    angles = [(index * 360 / 60) % 360 for index in range(frames)]
+
+    start = perf_counter()
+    for angle in angles:
+        for _ in range(hats):
+            pygame.transform.rotate(surf, angle)
+    per_frame = (perf_counter() - start) / frames * 1000
+
+    start = perf_counter()
+    for step in range(ROTATION_STEPS):
+        rotate(surf, step * 360 / ROTATION_STEPS)
+    build = (perf_counter() - start) * 1000
+
+    start = perf_counter()
+    for angle in angles:
+        for _ in range(hats):
+            rotate(surf, angle)
+    cached = (perf_counter() - start) / frames * 1000
+
+    print(f"{hats} falling hats, {ROTATION_STEPS} angles")
+    print(f"pygame.transform.rotate : {per_frame:.4f} ms/frame")
+    print(f"cached rotate           : {cached:.4f} ms/frame (+ {build:.2f} ms once per surface)")
+
+
+def evict(paths: List[str]) -> None:
+    # drops the files from the page cache so that the next read really comes from the disk
+    for path in paths:
+        fd = os.open(path, os.O_RDONLY)
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        os.close(fd)
+
+
+def startup(mode: str = "") -> None:
+    import main
+
+    if mode:
+        # one measured run, in its own process so that nothing is cached in memory
+        main.USE_ASSET_BUNDLE = mode == "bundle"
+        game = main.Game.__new__(main.Game)
+        start = perf_counter()
+        game.import_graphics()
+        graphics = perf_counter()
+        game.import_audio()
+        print(f"{(graphics - start) * 1000:.1f} {(perf_counter() - start) * 1000:.1f}")
+        return
+
+    from bundle import BUNDLE_PATH, load_bundle
+
+    load_bundle().close()
+    assets = [os.path.join(folder_path, name) for root in ("graphics", "audio") for folder_path, _, names in os.walk(os.path.join("..", root)) for name in names]
+    can_evict = hasattr(os, "posix_fadvise")
+
+    print("            import_graphics  import_assets")
+    for mode in ("png", "bundle"):
+        for run in ("cold", "warm"):
+            if run == "cold" and not can_evict:
+                continue
+            if run == "cold":
+                evict(assets + [BUNDLE_PATH])
+            result = subprocess.run([sys.executable, os.path.abspath(__file__), "startup", mode], capture_output=True, text=True, check=True)
+            graphics, total = result.stdout.split()[-2:]
+            print(f"{mode:<6} {run:<4} : {float(graphics):11.1f} ms {float(total):11.1f} ms")
+
+
+def first_frame(workers: str = "", runs: int = 3) -> None:
+    import main
+
+    if workers:
+        # one measured start, in its own process: the first loading screen frame, then the first overworld frame
+        main.LOADER_WORKERS = int(workers)
+
+        shown = []
+        display_update = pygame.display.update
+        def update(*args) -> None:
+            shown.append(perf_counter())
+            display_update(*args)
+        pygame.display.update = update
+
+        start = perf_counter()
+        game = main.Game()
+        game.current_stage.run(0)
+        game.ui.update(0, game.data.health, game.data.coins)
+        pygame.display.update()
+        print(f"{(shown[0] - start) * 1000:.1f} {(shown[-1] - start) * 1000:.1f}")
+        return
+
+    print(f"{os.cpu_count()} cores, best of {runs}")
+    print("workers  loading screen  first frame")
+    for count in (0, LOADER_WORKERS):
+        results = []
+        for _ in range(runs):
+            result = subprocess.run([sys.executable, os.path.abspath(__file__), "first_frame", str(count)], capture_output=True, text=True, check=True)
+            results.append([float(value) for value in result.stdout.split()[-2:]])
+        loading, frame = min(results, key = lambda result: result[1])
+        print(f"{count:>7} {loading:12.1f} ms {frame:9.1f} ms")
+
+
+def resources() -> None:
+    import main
+    from resources import resources, RESOURCE_CATEGORIES
+
+    main.Game()
+    resident = resources.get_resident_bytes()
+    counts = resources.get_counts()
+    print("category  entries  references  resident")
+    for category in RESOURCE_CATEGORIES:
+        entries, references = counts[category]
+        print(f"{category:<8} {entries:>8} {references:>11} {resident[category] / 1024:>9.0f} KiB")
+    print(f"{'total':<8} {sum(resident.values()) / 1024 / 1024:>30.1f} MiB")
+
+
+def level_loading(runs: int = 5) -> None:
+    from loader import finish_tmx
+    from compiled_level import CompiledMap, compile_level, get_compiled_path
+
+    def best(load: Callable[[], None]) -> float:
+        timings = []
+        for _ in range(int(runs)):
+            start = perf_counter()
+            load()
+            timings.append((perf_counter() - start) * 1000)
+        return min(timings)
+
+    levels_path = os.path.join('..', 'data', 'levels')
+    print(f"best of {runs}     load_pygame   compile   compiled    tmx size  compiled size")
+    for file_name in sorted(os.listdir(levels_path)):
+        tmx_path = os.path.join(levels_path, file_name)
+        compiled_path = get_compiled_path(tmx_path)
+        tmx = best(lambda: load_pygame(tmx_path))
+        build = best(lambda: compile_level(tmx_path, compiled_path))
+        compiled = best(lambda: finish_tmx(CompiledMap(compiled_path, levels_path)))
+        print(f"{file_name:<10} {tmx:12.1f} ms {build:6.1f} ms {compiled:7.1f} ms {os.path.getsize(tmx_path) / 1024:8.1f} KiB {os.path.getsize(compiled_path) / 1024:9.1f} KiB")
+
+
+def tileset_sharing() -> None:
+    from level_registry import LevelRegistry
+    from tilesets import tilesets
+
+    def get_size(images: List[pygame.Surface]) -> int:
+        images = {id(image): image for image in images if image}
+        return sum(image.get_width() * image.get_height() * image.get_bytesize() for image in images.values())
+
+    # every map on its own, as load_pygame does it, then every map through the shared tilesets
+    levels_path = os.path.join('..', 'data', 'levels')
+    maps = [load_pygame(os.path.join(levels_path, file_name)) for file_name in sorted(os.listdir(levels_path))]
+    separate = sum(get_size(tmx_map.images) for tmx_map in maps)
+    surfaces = sum(len({id(image) for image in tmx_map.images if image}) for tmx_map in maps)
+
+    levels = LevelRegistry(memory_limit = 1 << 40)
+    for key in levels.keys():
+        levels.get(key)
+    print(f"{len(maps)} maps       surfaces  tile memory")
+    print(f"separate {surfaces:>12} {separate / 1024:>8.0f} KiB")
+    print(f"shared   {len(tilesets.tiles):>12} {levels.get_memory() / 1024:>8.0f} KiB")
+    print(f"saved    {surfaces - len(tilesets.tiles):>12} {(separate - levels.get_memory()) / 1024:>8.0f} KiB")
+
+
+def transition_frames() -> None:
+    import main
+
+    game = main.Game()
+    print("level   at once  worst frame   sliced  worst frame  frames")
+    for level in game.levels.keys():
+        if not isinstance(level, int):
+            continue
+        game.data.current_level = level
+        game.levels.get(level)
+
+        # the frames of a whole transition into the level, the map itself is already parsed
+        worst = {}
+        for incremental in (False, True):
+            frames = []
+            game.transition.start(on_midpoint = lambda: game.switch_stage('level', incremental = incremental), load = game.build_stage)
+            while game.transition.active:
+                start = perf_counter()
+                game.current_stage.run(1 / 60)
+                game.transition.update(1 / 60)
+                game.transition.draw()
+                frames.append((perf_counter() - start) * 1000)
+            worst[incremental] = max(frames)
+        print(f"{level:<5} {worst[False]:16.1f} ms {worst[True]:15.1f} ms {len(frames):>7}")
+
+
+def restart(frames: int = 300) -> None:
+    import main
+
+    game = main.Game()
+    print("level     build  restart  sprites")
+    for level in range(6):
+        game.data.current_level = level
+        game.levels.get(level)
+        start = perf_counter()
+        game.switch_stage('level')
+        build = (perf_counter() - start) * 1000
+
+        # some play first, so that there is something to undo
+        game.start_level()
+        for _ in range(int(frames)):
+            game.current_stage.run(1 / 60)
+        start = perf_counter()
+        game.current_stage.restart()
+        print(f"{level:<5} {build:7.1f} ms {(perf_counter() - start) * 1000:5.1f} ms {len(game.current_stage.all_sprites):>8}")
+
+
+def overworld_return(runs: int = 10) -> None:
+    import main
+    from overworld import Overworld
+
+    game = main.Game()
+    build, refresh = [], []
+    for run in range(int(runs)):
+        game.data.unlocked_level = run % 6
+        start = perf_counter()
+        Overworld(game.tmx_overworld, game.data, game.overworld_frames, game.start_stage_transition)
+        build.append((perf_counter() - start) * 1000)
+        start = perf_counter()
+        game.overworld.refresh(game.data)
+        refresh.append((perf_counter() - start) * 1000)
+    print(f"best of {runs}: new overworld {min(build):.1f} ms, refresh {min(refresh):.2f} ms, {len(game.overworld.all_sprites)} sprites")
+
+
+def overworld_background(frames: int = 300) -> None:
+    import main
+    import overworld
+
+    game = main.Game()
+    print("overworld       bg sprites  tile memory  draw")
+    for bake in (False, True):
+        overworld.BAKE_OVERWORLD_BACKGROUND = bake
+        world = overworld.Overworld(game.tmx_overworld, game.data, game.overworld_frames, game.start_stage_transition)
+        sprites = [sprite for sprite in world.all_sprites if sprite.z in (Z_LAYERS['bg tiles'], Z_LAYERS['bg details'])]
+
+        # per sprite, the tiles and water frames they point to, baked, the chunks of every water frame
+        images = {id(image): image for sprite in sprites for image in getattr(sprite, 'frames', [sprite.image])}
+        memory = sum(image.get_width() * image.get_height() * image.get_bytesize() for image in images.values())
+        memory += world.all_sprites.get_tile_memory()
+
+        # a walk over the whole map, so that every chunk gets drawn
+        start = perf_counter()
+        for frame in range(int(frames)):
+            x = frame / int(frames) * game.tmx_overworld.width * TILE_SIZE
+            world.all_sprites.update(1 / 60)
+            world.all_sprites.draw((x, x * WINDOW_HEIGHT / WINDOW_WIDTH))
+        draw = (perf_counter() - start) / int(frames) * 1000
+        print(f"{'baked' if bake else 'sprites':<8} {len(sprites):>17} {memory / 1024:>8.0f} KiB {draw:5.2f} ms/frame")
+
+
+def batched_draw(frames: int = 300) -> None:
+    import main
+    from tilemap import Blit
+
+    game = main.Game()
+    display_surface = game.display_surface
+
+    # the densest level, by sprites drawn on a sweep across it
+    def sweep(group: pygame.sprite.AbstractGroup) -> List[pygame.FRect]:
+        camera_rects = []
+        for frame in range(int(frames)):
+            x = frame / int(frames) * group.width
+            group.center_on((x, x * group.height / group.width))
+            group.camera_constraint()
+            camera_rects.append(group.start_frame())
+        return camera_rects
+
+    def count(level: int) -> int:
+        game.data.current_level = level
+        game.switch_stage('level')
+        group = game.current_stage.all_sprites
+        return sum(len(group.get_blits(z, camera_rect)) for camera_rect in sweep(group) for z in group.layer_order)
+
+    level = max(range(6), key = count)
+    game.data.current_level = level
+    game.switch_stage('level')
+    group = game.current_stage.all_sprites
+    camera_rects = sweep(group)
+
+    def per_sprite(camera_rect: pygame.FRect) -> None:
+        # as before: one blit call and one Vector2 per sprite
+        for z in group.layer_order:
+            if z in group.tile_layers:
+                for chunk, pos in group.tile_layers[z].get_blits(camera_rect):
+                    display_surface.blit(chunk, pos)
+            for sprite in group.get_visible_sprites(z, camera_rect):
+                display_surface.blit(sprite.image, sprite.rect.topleft + group.offset)
+
+    def get_blits(camera_rect: pygame.FRect) -> List[Blit]:
+        return [blit for z in group.layer_order for blit in group.get_blits(z, camera_rect)]
+
+    draws: Dict[str, Callable[[pygame.FRect], None]] = {
+        "blit per sprite": per_sprite,
+        "blits": lambda camera_rect: display_surface.blits(get_blits(camera_rect), doreturn = False),
+        "fblits": lambda camera_rect: display_surface.fblits(get_blits(camera_rect)),
+    }
+    blit_count = sum(len(get_blits(camera_rect)) for camera_rect in camera_rects) / len(camera_rects)
+    print(f"level {level}, {blit_count:.0f} surfaces drawn per frame on average, best of 3 sweeps")
+    for name, draw in draws.items():
+        timings = []
+        for _ in range(3):
+            start = perf_counter()
+            for camera_rect in camera_rects:
+                group.offset.update(-camera_rect.left, -camera_rect.top)
+                draw(camera_rect)
+            timings.append((perf_counter() - start) / len(camera_rects) * 1000)
+        print(f"{name:<16} {min(timings):6.3f} ms/frame")
+
+
+def simulation(seconds: int = 60) -> None:
+    from simulation import Simulation
+
+    # runs right, jumps every 45 steps and attacks every 70, turning back now and then
+    def keys(step: int) -> List[int]:
+        held = [pygame.K_d if (step // 90) % 4 < 3 else pygame.K_q]
+        if step % 45 < 3:
+            held.append(pygame.K_z)
+        if step % 70 == 0:
+            held.append(pygame.K_e)
+        return held
+
+    sim = Simulation(keys)
+    print(f"{seconds} simulated seconds per level, dt {SIMULATION_DT:.4f} s")
+    print("level    headless      drawn")
+    for level in range(6):
+        speeds = []
+        for draw in (False, True):
+            sim.draw = draw
+            sim.enter_level(level, seed = level)
+            start = perf_counter()
+            for _ in range(round(int(seconds) / SIMULATION_DT)):
+                sim.step()
+                # played again on the spot instead of going back to a new game
+                if sim.game.game_over_layer.visible:
+                    sim.game.restart_level()
+            speeds.append(int(seconds) / (perf_counter() - start))
+        print(f"{level:<5} {speeds[0]:>8.0f} x {speeds[1]:>8.0f} x")
+    sim.close()
+
+
+BENCHMARKS: Dict[str, Callable[..., None]] = {
+    "collision": collision_rects,
+    "rotation": rotation,
+    "startup": startup,
+    "first_frame": first_frame,
+    "resources": resources,
+    "levels": level_loading,
+    "tilesets": tileset_sharing,
+    "transition": transition_frames,
+    "restart": restart,
+    "overworld": overworld_return,
+    "overworld_bg": overworld_background,
+    "blits": batched_draw,
+    "simulation": simulation,
+}
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] not in BENCHMARKS:
+        print(f"Usage: python benchmark.py [{'|'.join(BENCHMARKS)}]")
+        sys.exit(1)
+
+    setup()
+    BENCHMARKS[sys.argv[1]](*sys.argv[2:])
@@ -2,6 +2,7 @@ import subprocess
 import os
 import shutil
 import sys
+from pack import pack
 
 def build(target: str) -> None:
     entry_point = os.path.join("src", "main.py")
@@ -24,6 +25,9 @@ def build(target: str) -> None:
         print("❌ Plateforme non supportée. Utilisez 'windows' ou 'ubuntu'.")
         sys.exit(1)
 
+    # Les images sont empaquetées avant d'être copiées avec le dossier data
+    pack()
+
     command = [
         "pyinstaller",
         "--onefile",
@@ -0,0 +1,33 @@
+import os
+import sys
+from time import perf_counter
+
+# le bundle est construit depuis src/, comme le jeu le charge
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+SRC_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "src")
+sys.path.insert(0, SRC_PATH)
+
+import pygame
+from bundle import BUNDLE_PATH, build_bundle, get_source_files
+
+
+def pack() -> None:
+    current_path = os.getcwd()
+    os.chdir(SRC_PATH)
+    pygame.init()
+    pygame.display.set_mode((1, 1))
+
+    start = perf_counter()
+    build_bundle()
+    duration = (perf_counter() - start) * 1000
+
+    images = len(get_source_files())
+    size = os.path.getsize(BUNDLE_PATH) / 1024 / 1024
+    print(f"✅ {images} images empaquetées dans '{os.path.normpath(os.path.join('src', BUNDLE_PATH))}' ({size:.1f} Mo, {duration:.0f} ms).")
+
+    pygame.quit()
+    os.chdir(current_path)
+
+
+if __name__ == "__main__":
+    pack()
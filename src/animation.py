@@ -0,0 +1,40 @@
+from settings import *
+from typing import Dict
+
+
+class AnimationClock:
+    def __init__(self, speed: float) -> None:
+        self.speed = speed
+        self.frame_index = 0.0
+
+    def update(self, dt: float) -> None:
+        self.frame_index += self.speed * dt
+
+
+class AnimationClocks:
+    def __init__(self, step: float = ANIMATION_SPEED_STEP) -> None:
+        self.step = step
+        self.clocks: Dict[float, AnimationClock] = {}
+
+    def get_clock(self, speed: float) -> AnimationClock:
+        # random speeds are snapped to a few values so that they can share a clock
+        speed = round(speed / self.step) * self.step
+        if speed not in self.clocks:
+            self.clocks[speed] = AnimationClock(speed)
+        return self.clocks[speed]
+
+    def save_state(self) -> Dict[float, float]:
+        return {speed: clock.frame_index for speed, clock in self.clocks.items()}
+
+    def restore_state(self, state: Dict[float, float]) -> None:
+        # winding the clocks back puts every animation back in its phase
+        for speed, frame_index in state.items():
+            self.clocks[speed].frame_index = frame_index
+
+    def update(self, dt: float) -> None:
+        for clock in self.clocks.values():
+            clock.update(dt)
+
+
+# advanced once per frame by the sprite group of the running stage
+clocks = AnimationClocks()
@@ -0,0 +1,190 @@
+import pygame
+import json
+import mmap
+import struct
+import hashlib
+import sys
+from settings import *
+from os import walk, replace, stat
+from os.path import join, normpath, exists
+from typing import Dict, List, Optional, Tuple
+
+BUNDLE_MAGIC = b'OLCB'
+BUNDLE_VERSION = 2
+BUNDLE_HEADER = struct.Struct('<4sHI')
+BUNDLE_PATH = join('..', 'data', 'assets.bundle')
+SOURCE_PATH = join('..', 'graphics')
+
+# pixels are stored in the byte order of a converted display surface so that loading is a plain copy
+ATLAS_WIDTH = 2048
+PIXEL_FORMAT = 'BGRA'
+
+
+def get_key(path: str, source: str) -> str:
+    return normpath(path)[len(normpath(source)) + 1:].replace('\\', '/')
+
+
+def get_source_files(source: str = SOURCE_PATH) -> List[str]:
+    paths = []
+    for folder_path, _, image_names in walk(source):
+        paths.extend(join(folder_path, image_name) for image_name in image_names if image_name.endswith('.png'))
+    return sorted(paths, key = lambda path: get_key(path, source))
+
+
+def get_stamp(paths: List[str], source: str = SOURCE_PATH) -> str:
+    digest = hashlib.blake2b(digest_size = 16)
+    for path in paths:
+        info = stat(path)
+        digest.update(f"{get_key(path, source)}:{info.st_size}:{info.st_mtime_ns}".encode())
+    return digest.hexdigest()
+
+
+def get_fingerprint(paths: List[str], source: str = SOURCE_PATH) -> str:
+    # hashed by content, copied or extracted files get new mtimes without being different
+    digest = hashlib.blake2b(digest_size = 16)
+    for path in paths:
+        digest.update(get_key(path, source).encode())
+        with open(path, 'rb') as file:
+            digest.update(file.read())
+    return digest.hexdigest()
+
+
+def pack_atlases(sizes: Dict[str, Tuple[int, int]]) -> Tuple[List[Tuple[int, int]], Dict[str, Tuple[int, int, int, int, int]]]:
+    # shelf packing, tallest images first
+    # every top level folder gets its own atlases, folders the game never loads (tilesets, map) are then never copied out
+    atlases, frames = [], {}
+    group = None
+    x = y = shelf_height = 0
+    for key in sorted(sizes, key = lambda key: (key.split('/')[0], -sizes[key][1], key)):
+        width, height = sizes[key]
+        new_group = key.split('/')[0] != group
+        if not new_group and x + width > ATLAS_WIDTH:
+            x, y, shelf_height = 0, y + shelf_height, 0
+        if new_group or y + height > ATLAS_WIDTH:
+            group = key.split('/')[0]
+            atlases.append((0, 0))
+            x = y = shelf_height = 0
+
+        frames[key] = (len(atlases) - 1, x, y, width, height)
+        atlases[-1] = (max(atlases[-1][0], x + width), max(atlases[-1][1], y + height))
+        x += width
+        shelf_height = max(shelf_height, height)
+    return atlases, frames
+
+
+def build_bundle(source: str = SOURCE_PATH, path: str = BUNDLE_PATH) -> None:
+    # needs a display mode to be set, every image goes through convert_alpha like in support
+    paths = get_source_files(source)
+    images = {get_key(image_path, source): pygame.image.load(image_path).convert_alpha() for image_path in paths}
+    atlases, frames = pack_atlases({key: image.get_size() for key, image in images.items()})
+
+    surfaces = [pygame.Surface(size, pygame.SRCALPHA) for size in atlases]
+    for key, (atlas, x, y, _, _) in frames.items():
+        # max blending onto a cleared atlas copies the pixels without premultiplying them
+        surfaces[atlas].blit(images[key], (x, y), special_flags = pygame.BLEND_RGBA_MAX)
+
+    pixels = [pygame.image.tobytes(surf, PIXEL_FORMAT) for surf in surfaces]
+    index = {
+        'stamp': get_stamp(paths, source),
+        'fingerprint': get_fingerprint(paths, source),
+        'format': PIXEL_FORMAT,
+        'atlases': [],
+        'frames': frames,
+    }
+
+    # offsets are relative to the end of the index, which is only known once it is serialized
+    offset = 0
+    for (width, height), data in zip(atlases, pixels):
+        index['atlases'].append((offset, width, height))
+        offset += len(data)
+    index_data = json.dumps(index).encode()
+
+    # written aside first so that a running game never maps a half written bundle
+    with open(path + '.tmp', 'wb') as file:
+        file.write(BUNDLE_HEADER.pack(BUNDLE_MAGIC, BUNDLE_VERSION, len(index_data)))
+        file.write(index_data)
+        for data in pixels:
+            file.write(data)
+    replace(path + '.tmp', path)
+
+
+class AssetBundle:
+    def __init__(self, path: str = BUNDLE_PATH, source: str = SOURCE_PATH) -> None:
+        self.source = source
+        with open(path, 'rb') as file:
+            self.data = mmap.mmap(file.fileno(), 0, access = mmap.ACCESS_READ)
+
+        magic, version, index_size = BUNDLE_HEADER.unpack_from(self.data)
+        if magic != BUNDLE_MAGIC or version != BUNDLE_VERSION:
+            raise ValueError(f"{path} is not a version {BUNDLE_VERSION} asset bundle")
+        index = json.loads(self.data[BUNDLE_HEADER.size:BUNDLE_HEADER.size + index_size])
+
+        self.stamp: str = index['stamp']
+        self.fingerprint: str = index['fingerprint']
+        self.format: str = index['format']
+        self.start = BUNDLE_HEADER.size + index_size
+        self.atlas_entries: List[Tuple[int, int, int]] = index['atlases']
+        self.frame_entries: Dict[str, Tuple[int, int, int, int, int]] = index['frames']
+
+        # atlases are only copied out of the mapping once one of their frames is requested
+        self.atlases: Dict[int, pygame.Surface] = {}
+
+    def get_atlas(self, atlas: int) -> pygame.Surface:
+        if atlas not in self.atlases:
+            offset, width, height = self.atlas_entries[atlas]
+            start = self.start + offset
+            with memoryview(self.data)[start:start + width * height * 4] as pixels:
+                self.atlases[atlas] = pygame.image.frombuffer(pixels, (width, height), self.format).convert_alpha()
+        return self.atlases[atlas]
+
+    def get(self, path: str) -> Optional[pygame.Surface]:
+        entry = self.frame_entries.get(get_key(path, self.source))
+        if entry is None:
+            return None
+        atlas, x, y, width, height = entry
+        return self.get_atlas(atlas).subsurface((x, y, width, height))
+
+    def close(self) -> None:
+        self.data.close()
+
+
+def write_stamp(path: str, bundle: AssetBundle, stamp: str) -> None:
+    # the new stamp has the length of the old one, it is written over it without rewriting the bundle
+    old_entry = json.dumps({'stamp': bundle.stamp})[1:-1].encode()
+    position = bundle.data.find(old_entry, BUNDLE_HEADER.size, bundle.start)
+    if position < 0:
+        return
+    try:
+        with open(path, 'r+b') as file:
+            file.seek(position)
+            file.write(json.dumps({'stamp': stamp})[1:-1].encode())
+        bundle.stamp = stamp
+    except OSError:
+        # read only installs keep hashing the contents
+        pass
+
+
+def load_bundle(path: str = BUNDLE_PATH, source: str = SOURCE_PATH) -> AssetBundle:
+    if exists(path):
+        try:
+            bundle = AssetBundle(path, source)
+
+            # a onefile build is extracted anew on every launch, its bundle was packed along with the same images
+            if getattr(sys, 'frozen', False):
+                return bundle
+
+            # file stats are enough as long as nothing was touched, contents are only hashed when they differ
+            paths = get_source_files(source)
+            stamp = get_stamp(paths, source)
+            if bundle.stamp == stamp:
+                return bundle
+            if bundle.fingerprint == get_fingerprint(paths, source):
+                # copied or extracted files, same contents: the next launch goes back to comparing stats
+                write_stamp(path, bundle, stamp)
+                return bundle
+            bundle.close()
+        except ValueError:
+            pass
+
+    build_bundle(source, path)
+    return AssetBundle(path, source)
@@ -0,0 +1,127 @@
+import pygame
+from settings import *
+from math import floor, ceil
+from spatial import SpatialGrid, IndexedGroup
+from typing import List, Tuple, Dict, Set, Union
+
+
+class CollisionSprites(IndexedGroup):
+    def __init__(self) -> None:
+        super().__init__()
+        # static bodies are hashed by tile, moving platforms are few enough to always be tested
+        self.static = SpatialGrid(TILE_SIZE)
+        self.dynamic: List[pygame.sprite.Sprite] = []
+
+    def insert(self, sprite: pygame.sprite.Sprite) -> None:
+        if hasattr(sprite, 'moving'):
+            self.dynamic.append(sprite)
+        else:
+            self.static.insert(sprite)
+
+    def discard(self, sprite: pygame.sprite.Sprite) -> None:
+        if sprite in self.dynamic:
+            self.dynamic.remove(sprite)
+        else:
+            self.static.remove(sprite)
+
+    def get_dynamic(self) -> List[pygame.sprite.Sprite]:
+        if self.pending:
+            self.flush()
+        return self.dynamic
+
+    def query(self, rect: Union[pygame.Rect, pygame.FRect]) -> List[pygame.sprite.Sprite]:
+        if self.pending:
+            self.flush()
+        sprites = self.static.query(rect)
+        sprites.update(self.dynamic)
+        return sorted(sprites, key = self.order.__getitem__)
+
+
+class HitboxSprites(IndexedGroup):
+    def __init__(self) -> None:
+        super().__init__()
+        self.grid = SpatialGrid()
+        self.nearby: Set[pygame.sprite.Sprite] = set()
+
+        # sprites with a direction (saws, spikes, teeth, pearls) move every frame
+        self.dynamic: Dict[pygame.sprite.Sprite, None] = {}
+
+    def insert(self, sprite: pygame.sprite.Sprite) -> None:
+        self.grid.insert(sprite)
+        if hasattr(sprite, 'direction'):
+            self.dynamic[sprite] = None
+
+    def discard(self, sprite: pygame.sprite.Sprite) -> None:
+        self.grid.remove(sprite)
+        self.dynamic.pop(sprite, None)
+
+    def refresh(self) -> None:
+        if self.pending:
+            self.flush()
+        for sprite in self.dynamic:
+            self.grid.move(sprite)
+
+    def query(self, rect: Union[pygame.Rect, pygame.FRect]) -> Set[pygame.sprite.Sprite]:
+        if self.pending:
+            self.flush()
+        return self.grid.query(rect, self.nearby)
+
+
+class SolidMap:
+    def __init__(self, width: int, height: int) -> None:
+        self.width, self.height = width, height
+        self.tiles = bytearray(width * height)
+
+        # solids that do not sit on the tile grid (crates, barrels, shells)
+        self.objects: List[Union[pygame.Rect, pygame.FRect]] = []
+
+    def add_tile(self, x: int, y: int) -> None:
+        self.tiles[y * self.width + x] = 1
+
+    def add_rect(self, rect: Union[pygame.Rect, pygame.FRect]) -> None:
+        self.objects.append(rect)
+
+    def is_solid(self, x: int, y: int) -> bool:
+        return 0 <= x < self.width and 0 <= y < self.height and self.tiles[y * self.width + x] == 1
+
+    def collide_point(self, pos: Tuple[float, float]) -> bool:
+        if self.is_solid(floor(pos[0] / TILE_SIZE), floor(pos[1] / TILE_SIZE)):
+            return True
+        return any(rect.collidepoint(pos) for rect in self.objects)
+
+    def collide_rect(self, rect: Union[pygame.Rect, pygame.FRect]) -> bool:
+        # same rules as colliderect: a rect only touching a tile edge does not collide
+        left, right = min(rect.left, rect.right), max(rect.left, rect.right)
+        top, bottom = min(rect.top, rect.bottom), max(rect.top, rect.bottom)
+        for y in range(floor(top / TILE_SIZE), ceil(bottom / TILE_SIZE)):
+            for x in range(floor(left / TILE_SIZE), ceil(right / TILE_SIZE)):
+                if self.is_solid(x, y):
+                    return True
+        return rect.collidelist(self.objects) >= 0
+
+    def merge_rects(self) -> List[pygame.Rect]:
+        # greedy: grow each free tile to the right, then downwards while the whole span stays solid
+        used = bytearray(len(self.tiles))
+        rects = []
+        for y in range(self.height):
+            for x in range(self.width):
+                index = y * self.width + x
+                if not self.tiles[index] or used[index]:
+                    continue
+
+                width = 1
+                while x + width < self.width and self.tiles[index + width] and not used[index + width]:
+                    width += 1
+
+                height = 1
+                while y + height < self.height:
+                    start = index + height * self.width
+                    if not all(self.tiles[start:start + width]) or any(used[start:start + width]):
+                        break
+                    height += 1
+
+                for row in range(height):
+                    start = index + row * self.width
+                    used[start:start + width] = b'\x01' * width
+                rects.append(pygame.Rect(x * TILE_SIZE, y * TILE_SIZE, width * TILE_SIZE, height * TILE_SIZE))
+        return rects
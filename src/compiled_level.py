@@ -0,0 +1,307 @@
+import pygame
+import pytmx
+import re
+import struct
+import hashlib
+from settings import *
+from array import array
+from tilesets import tilesets
+from os import listdir, makedirs, remove, replace
+from os.path import join, dirname, basename, splitext, normpath, relpath, exists
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+LEVEL_MAGIC = b'OLCL'
+LEVEL_VERSION = 1
+LEVEL_CACHE_PATH = join('..', 'data', 'cache')
+
+# typed property values: none, bool, int, float, or an index in the string table
+VALUE_FORMATS = {'n': '?', '?': '?', 'q': 'q', 'd': 'd', 's': 'H'}
+NO_STRING = 0xFFFF
+
+# name, x, y, width, height, gid and a bit per schema field present on the object
+RECORD_HEADER = struct.Struct('<HddddHQ')
+TileSource = Tuple[str, Optional[str], Optional[Tuple[int, int, int, int]], Tuple[bool, bool, bool]]
+
+
+def get_value_type(value: Any) -> str:
+    if value is None:
+        return 'n'
+    if isinstance(value, bool):
+        return '?'
+    if isinstance(value, int):
+        return 'q'
+    if isinstance(value, float):
+        return 'd'
+    return 's'
+
+
+def get_properties(obj: pytmx.TiledObject) -> Dict[str, Any]:
+    # tile objects inherit their tile's animation frames, the levels never read them
+    return {key: value for key, value in obj.properties.items() if not isinstance(value, (list, tuple, dict))}
+
+
+class LevelWriter:
+    def __init__(self) -> None:
+        self.body = bytearray()
+        self.strings: Dict[str, int] = {}
+
+    def pack(self, format: str, *values: Any) -> None:
+        self.body += struct.pack('<' + format, *values)
+
+    def string(self, value: Optional[str]) -> int:
+        if value is None:
+            return NO_STRING
+        if value not in self.strings:
+            self.strings[value] = len(self.strings)
+        return self.strings[value]
+
+    def value(self, value: Any) -> None:
+        value_type = get_value_type(value)
+        self.pack('c', value_type.encode())
+        self.pack(VALUE_FORMATS[value_type], self.encode(value, value_type))
+
+    def encode(self, value: Any, value_type: str) -> Any:
+        if value_type == 's':
+            return self.string(str(value))
+        return False if value_type == 'n' else value
+
+    def properties(self, properties: Dict[str, Any]) -> None:
+        self.pack('H', len(properties))
+        for key, value in properties.items():
+            self.pack('H', self.string(key))
+            self.value(value)
+
+    def getvalue(self) -> bytes:
+        # the string table goes first so that the reader can resolve indices as it goes
+        table = bytearray(struct.pack('<H', len(self.strings)))
+        for value in self.strings:
+            data = value.encode()
+            table += struct.pack('<H', len(data)) + data
+        return bytes(table) + bytes(self.body)
+
+
+class LevelReader:
+    def __init__(self, data: bytes, offset: int = 0) -> None:
+        self.data = data
+        self.offset = offset
+        self.strings: List[str] = []
+        for _ in range(self.unpack('H')[0]):
+            size = self.unpack('H')[0]
+            self.strings.append(self.data[self.offset:self.offset + size].decode())
+            self.offset += size
+
+    def unpack(self, format: str) -> Tuple[Any, ...]:
+        values = struct.unpack_from('<' + format, self.data, self.offset)
+        self.offset += struct.calcsize('<' + format)
+        return values
+
+    def string(self, index: int) -> Optional[str]:
+        return None if index == NO_STRING else self.strings[index]
+
+    def value(self) -> Any:
+        value_type = self.unpack('c')[0].decode()
+        return self.decode(self.unpack(VALUE_FORMATS[value_type])[0], value_type)
+
+    def decode(self, value: Any, value_type: str) -> Any:
+        if value_type == 's':
+            return self.string(value)
+        return None if value_type == 'n' else value
+
+    def properties(self) -> Dict[str, Any]:
+        return {self.string(self.unpack('H')[0]): self.value() for _ in range(self.unpack('H')[0])}
+
+
+def recording_image_loader(filename: str, colorkey: Optional[str], **kwargs: Any):
+    # lets pytmx map every gid, but only keeps where each tile comes from
+    def load_image(rect: Optional[Tuple[int, int, int, int]] = None, flags: Any = None) -> TileSource:
+        flips = (bool(flags.flipped_horizontally), bool(flags.flipped_vertically), bool(flags.flipped_diagonally)) if flags else (False, False, False)
+        return filename, colorkey, tuple(rect) if rect else None, flips
+    return load_image
+
+
+def compile_level(tmx_path: str, path: str) -> None:
+    tmx_map = pytmx.TiledMap(tmx_path, image_loader = recording_image_loader)
+    base = dirname(tmx_path)
+    writer = LevelWriter()
+
+    # header: map size and the level properties held by the single object of the Data layer
+    writer.pack('HHHH', tmx_map.width, tmx_map.height, tmx_map.tilewidth, tmx_map.tileheight)
+    layer_names = [layer.name for layer in tmx_map.layers]
+    writer.properties(get_properties(tmx_map.get_layer_by_name('Data')[0]) if 'Data' in layer_names else {})
+
+    # where every gid is cut from
+    sources = [(gid, source) for gid, source in enumerate(tmx_map.images) if source]
+    writer.pack('HH', len(tmx_map.images), len(sources))
+    for gid, (filename, colorkey, rect, flips) in sources:
+        writer.pack('HHH', gid, writer.string(relpath(filename, base).replace('\\', '/')), writer.string(colorkey))
+        writer.pack('?HHHH', rect is not None, *(rect if rect else (0, 0, 0, 0)))
+        writer.pack('???', *flips)
+
+    layers = [layer for layer in tmx_map.layers if layer.name != 'Data']
+    writer.pack('H', len(layers))
+    for layer in layers:
+        writer.pack('H', writer.string(layer.name))
+        if isinstance(layer, pytmx.TiledTileLayer):
+            writer.pack('c', b't')
+            writer.body += array('H', (gid for row in layer.data for gid in row)).tobytes()
+
+        elif isinstance(layer, pytmx.TiledObjectGroup):
+            writer.pack('c', b'o')
+
+            # one column per property name and type met in the layer
+            schema = list(dict.fromkeys((key, get_value_type(value)) for obj in layer for key, value in get_properties(obj).items()))
+            writer.pack('B', len(schema))
+            for key, value_type in schema:
+                writer.pack('Hc', writer.string(key), value_type.encode())
+
+            columns = {field: index for index, field in enumerate(schema)}
+            writer.pack('H', len(layer))
+            for obj in layer:
+                values = {columns[(key, get_value_type(value))]: value for key, value in get_properties(obj).items()}
+                mask = sum(1 << index for index in values)
+                writer.body += RECORD_HEADER.pack(writer.string(obj.name), obj.x, obj.y, obj.width, obj.height, obj.gid, mask)
+                for index, (_, value_type) in enumerate(schema):
+                    value = values.get(index, '' if value_type == 's' else 0)
+                    writer.pack(VALUE_FORMATS[value_type], writer.encode(value, value_type))
+
+        else:
+            # image layers and groups are not used by the levels
+            writer.pack('c', b'n')
+
+    data = writer.getvalue()
+    with open(path + '.tmp', 'wb') as file:
+        file.write(struct.pack('<4sH', LEVEL_MAGIC, LEVEL_VERSION))
+        file.write(data)
+    replace(path + '.tmp', path)
+
+
+class CompiledObject:
+    def __init__(self, parent: 'CompiledMap', name: Optional[str], x: float, y: float, width: float, height: float, gid: int, properties: Dict[str, Any]) -> None:
+        self.parent = parent
+        self.name = name
+        self.x, self.y = x, y
+        self.width, self.height = width, height
+        self.gid = gid
+        self.properties = properties
+
+    @property
+    def image(self) -> Optional[pygame.Surface]:
+        return self.parent.images[self.gid] if self.gid else None
+
+
+class CompiledTileLayer:
+    def __init__(self, parent: 'CompiledMap', name: str, data: array) -> None:
+        self.parent = parent
+        self.name = name
+        self.data = data
+
+    def tiles(self) -> Iterator[Tuple[int, int, pygame.Surface]]:
+        # same order as pytmx: row by row, empty cells skipped
+        images, width = self.parent.images, self.parent.width
+        for index, gid in enumerate(self.data):
+            if gid:
+                yield index % width, index // width, images[gid]
+
+
+class CompiledMap:
+    def __init__(self, path: str, base: str) -> None:
+        with open(path, 'rb') as file:
+            data = file.read()
+
+        magic, version = struct.unpack_from('<4sH', data)
+        if magic != LEVEL_MAGIC or version != LEVEL_VERSION:
+            raise ValueError(f"{path} is not a version {LEVEL_VERSION} compiled level")
+        reader = LevelReader(data, struct.calcsize('<4sH'))
+
+        self.width, self.height, self.tilewidth, self.tileheight = reader.unpack('HHHH')
+        self.properties = reader.properties()
+
+        # tiles are cut and flipped here, or shared with maps already loaded, converting them is left to finish_tmx
+        image_count, source_count = reader.unpack('HH')
+        self.images: List[Any] = [None] * image_count
+        loaders: Dict[Tuple[str, Optional[str]], Callable[..., Any]] = {}
+        for _ in range(source_count):
+            gid, filename, colorkey = reader.unpack('HHH')
+            has_rect, *rect = reader.unpack('?HHHH')
+            flips = pytmx.TileFlags(*reader.unpack('???'))
+
+            source = normpath(join(base, reader.string(filename))), reader.string(colorkey)
+            if source not in loaders:
+                loaders[source] = tilesets.image_loader(*source)
+            self.images[gid] = loaders[source](rect if has_rect else None, flips if any(flips) else None)
+
+        self.layers: List[Union[CompiledTileLayer, List[CompiledObject]]] = []
+        self.layer_names: Dict[str, Union[CompiledTileLayer, List[CompiledObject]]] = {}
+        for _ in range(reader.unpack('H')[0]):
+            name = reader.string(reader.unpack('H')[0])
+            kind = reader.unpack('c')[0]
+            if kind == b't':
+                size = self.width * self.height
+                layer = CompiledTileLayer(self, name, array('H', data[reader.offset:reader.offset + size * 2]))
+                reader.offset += size * 2
+
+            elif kind == b'o':
+                schema = []
+                for _ in range(reader.unpack('B')[0]):
+                    key, value_type = reader.unpack('Hc')
+                    schema.append((reader.string(key), value_type.decode()))
+
+                layer = []
+                for _ in range(reader.unpack('H')[0]):
+                    obj_name, x, y, width, height, gid, mask = reader.unpack(RECORD_HEADER.format[1:])
+                    properties = {}
+                    for index, (key, value_type) in enumerate(schema):
+                        value = reader.unpack(VALUE_FORMATS[value_type])[0]
+                        if mask & 1 << index:
+                            properties[key] = reader.decode(value, value_type)
+                    layer.append(CompiledObject(self, reader.string(obj_name), x, y, width, height, gid, properties))
+
+            else:
+                continue
+            self.layers.append(layer)
+            self.layer_names[name] = layer
+
+        # the level properties stand in for the Data layer they were taken from
+        if self.properties:
+            self.layer_names['Data'] = [CompiledObject(self, None, 0, 0, 0, 0, 0, self.properties)]
+
+    def get_layer_by_name(self, name: str) -> Union[CompiledTileLayer, List[CompiledObject]]:
+        if name not in self.layer_names:
+            raise ValueError(f"Layer '{name}' not found.")
+        return self.layer_names[name]
+
+
+def get_level_hash(tmx_path: str) -> str:
+    # the map, the tilesets it references and the format, images are read at load time anyway
+    digest = hashlib.blake2b(digest_size = 16)
+    digest.update(struct.pack('<4sH', LEVEL_MAGIC, LEVEL_VERSION))
+    with open(tmx_path, 'rb') as file:
+        tmx_data = file.read()
+    digest.update(tmx_data)
+    for source in re.findall(rb'<tileset[^>]*source="([^"]+)"', tmx_data):
+        with open(join(dirname(tmx_path), source.decode()), 'rb') as file:
+            digest.update(file.read())
+    return digest.hexdigest()
+
+
+def get_compiled_path(tmx_path: str, cache_path: str = LEVEL_CACHE_PATH) -> str:
+    # compiled again whenever the map or one of its tilesets changes, older builds are dropped
+    name = splitext(basename(tmx_path))[0]
+    path = join(cache_path, f"{name}.{get_level_hash(tmx_path)}.level")
+    if not exists(path):
+        makedirs(cache_path, exist_ok = True)
+        for file_name in listdir(cache_path):
+            if file_name.startswith(f"{name}.") and file_name.endswith('.level'):
+                remove(join(cache_path, file_name))
+        compile_level(tmx_path, path)
+    return path
+
+
+def decode_level(tmx_path: str) -> CompiledMap:
+    path = get_compiled_path(tmx_path)
+    try:
+        return CompiledMap(path, dirname(tmx_path))
+    except ValueError:
+        # written by another version of the game, compiled again like a stale asset bundle
+        compile_level(tmx_path, path)
+        return CompiledMap(path, dirname(tmx_path))
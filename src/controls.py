@@ -0,0 +1,46 @@
+import pygame
+from typing import Iterable, Optional, Set, Union
+
+
+class KeyState:
+    def __init__(self, keys: Set[int]) -> None:
+        # indexed by key code, like the result of pygame.key.get_pressed()
+        self.keys = keys
+
+    def __getitem__(self, key: int) -> bool:
+        return key in self.keys
+
+
+class ScriptedKeys:
+    def __init__(self) -> None:
+        self.pressed: Set[int] = set()
+        self.just_pressed: Set[int] = set()
+
+    def press(self, keys: Iterable[int]) -> None:
+        # the keys held during the next frame, the ones that were not held before are just pressed
+        keys = set(keys)
+        self.just_pressed = keys - self.pressed
+        self.pressed = keys
+
+    def get_pressed(self) -> KeyState:
+        return KeyState(self.pressed)
+
+    def get_just_pressed(self) -> KeyState:
+        return KeyState(self.just_pressed)
+
+
+# the live keyboard, unless the keys are fed by a headless simulation or a replay
+key_source: Optional[ScriptedKeys] = None
+
+
+def use_keys(source: Optional[ScriptedKeys]) -> None:
+    global key_source
+    key_source = source
+
+
+def get_pressed() -> Union[pygame.key.ScancodeWrapper, KeyState]:
+    return key_source.get_pressed() if key_source else pygame.key.get_pressed()
+
+
+def get_just_pressed() -> Union[pygame.key.ScancodeWrapper, KeyState]:
+    return key_source.get_just_pressed() if key_source else pygame.key.get_just_pressed()
@@ -1,5 +1,5 @@
 from ui import UI
-from typing import Callable
+from typing import Callable, Tuple
 
 
 class Data:
@@ -13,6 +13,13 @@ class Data:
         self.unlocked_level = 0
         self.current_level = 0
 
+    def save_state(self) -> Tuple[int, int]:
+        return self._coins, self._health
+
+    def restore_state(self, state: Tuple[int, int]) -> None:
+        # bypasses the setters, the hats are restored with the rest of the level
+        self._coins, self._health = state
+
     @property
     def coins(self) -> int:
         return self._coins
@@ -1,41 +1,53 @@
 import pygame
 from settings import *
 from random import choice
-from timer_ import Timer
+from timer_ import Timer, TimerState
 from player import Player
+from collision import SolidMap
+from animation import clocks
+from transforms import flip, flip_frames
 from typing import Tuple, List, Union, Callable, Dict
 
 
 class Tooth(pygame.sprite.Sprite):
     def __init__(
         self, pos: Tuple[int, int], frames: List[pygame.Surface], 
-        groups: Union[List[pygame.sprite.Group], pygame.sprite.Group], collision_sprites: pygame.sprite.Group
+        groups: Union[List[pygame.sprite.Group], pygame.sprite.Group], solid_map: SolidMap
     ) -> None:
         super().__init__(groups)
-        self.frames, self.frame_index = frames, 0
-        self.image = self.frames[self.frame_index]
-        self.rect = self.image.get_frect(topleft = pos)
+        self.frames = frames
+        self.clock = clocks.get_clock(ANIMATION_SPEED)
+        self.start_index = self.clock.frame_index
+        self.rect = self.frames[0].get_frect(topleft = pos)
         self.z = Z_LAYERS['main']
 
         self.direction = choice((-1, 1))
-        self.collision_rects = [sprite.rect for sprite in collision_sprites]
+        self.solid_map = solid_map
         self.speed = 200
 
         self.hit_timer = Timer(250)
 
+    def save_state(self) -> Tuple[pygame.FRect, int, TimerState]:
+        return self.rect.copy(), self.direction, self.hit_timer.save_state()
+
+    def restore_state(self, state: Tuple[pygame.FRect, int, TimerState]) -> None:
+        rect, self.direction, hit_timer = state
+        self.rect.update(rect)
+        self.hit_timer.restore_state(hit_timer)
+
     def reverse(self) -> None:
         if not self.hit_timer.active:
             self.direction *= -1
             self.hit_timer.activate()
 
+    @property
+    def image(self) -> pygame.Surface:
+        image = self.frames[int((self.clock.frame_index - self.start_index) % len(self.frames))]
+        return flip(image, True, False) if self.direction < 0 else image
+
     def update(self, dt: float) -> None:
         self.hit_timer.update()
 
-        # animate
-        self.frame_index += ANIMATION_SPEED * dt
-        self.image = self.frames[int(self.frame_index % len(self.frames))]
-        self.image = pygame.transform.flip(self.image, True, False) if self.direction < 0 else self.image
-
         # move
         self.rect.x += self.direction * self.speed * dt
 
@@ -44,9 +56,9 @@ class Tooth(pygame.sprite.Sprite):
         floor_rect_left = pygame.FRect(self.rect.bottomleft, (-1,1))
         wall_rect = pygame.FRect(self.rect.topleft + pygame.Vector2(-1,0), (self.rect.width + 2, 1))
 
-        if floor_rect_right.collidelist(self.collision_rects) < 0 and self.direction > 0 or\
-            floor_rect_left.collidelist(self.collision_rects) < 0 and self.direction < 0 or \
-            wall_rect.collidelist(self.collision_rects) != -1:
+        if not self.solid_map.collide_rect(floor_rect_right) and self.direction > 0 or\
+            not self.solid_map.collide_rect(floor_rect_left) and self.direction < 0 or \
+            self.solid_map.collide_rect(wall_rect):
             self.direction *= -1
 
 
@@ -60,9 +72,7 @@ class Shell(pygame.sprite.Sprite):
         super().__init__(groups)
 
         if reverse:
-            self.frames: Dict[str, pygame.Surface] = {}
-            for key, surfs in frames.items():
-                self.frames[key] = [pygame.transform.flip(surf, True, False) for surf in surfs]
+            self.frames: Dict[str, pygame.Surface] = {key: flip_frames(surfs, True, False) for key, surfs in frames.items()}
             self.bullet_direction = -1
         else:
             self.frames = frames
@@ -79,6 +89,13 @@ class Shell(pygame.sprite.Sprite):
         self.has_fired = False
         self.create_pearl = create_pearl
 
+    def save_state(self) -> Tuple[float, str, pygame.Surface, bool, TimerState]:
+        return self.frame_index, self.state, self.image, self.has_fired, self.shoot_timer.save_state()
+
+    def restore_state(self, state: Tuple[float, str, pygame.Surface, bool, TimerState]) -> None:
+        self.frame_index, self.state, self.image, self.has_fired, shoot_timer = state
+        self.shoot_timer.restore_state(shoot_timer)
+
     def state_management(self) -> None:
         player_pos = pygame.Vector2(self.player.hitbox_rect.center)
         shell_pos = pygame.Vector2(self.rect.center)
@@ -130,6 +147,15 @@ class Pearl(pygame.sprite.Sprite):
         }
         self.timers['lifetime'].activate()
 
+    def save_state(self) -> Tuple[pygame.FRect, int, Dict[str, TimerState]]:
+        return self.rect.copy(), self.direction, {name: timer.save_state() for name, timer in self.timers.items()}
+
+    def restore_state(self, state: Tuple[pygame.FRect, int, Dict[str, TimerState]]) -> None:
+        rect, self.direction, timers = state
+        self.rect.update(rect)
+        for name, timer in timers.items():
+            self.timers[name].restore_state(timer)
+
     def reverse(self) -> None:
         if not self.timers['reverse'].active:
             self.direction *= -1
@@ -1,5 +1,6 @@
 import pygame
 from os.path import join
+from resources import resources
 from typing import Callable
 
 
@@ -7,8 +8,8 @@ class GameoverLayer:
     def __init__(self, surface: pygame.Surface, on_restart: Callable[[], None]):
         self.surface = surface
         self.on_restart = on_restart
-        self.font = pygame.font.Font(join('..', 'graphics', 'ui', 'runescape_uf.ttf'), 48)
-        self.button_font = pygame.font.Font(join('..', 'graphics', 'ui', 'runescape_uf.ttf'), 36)
+        self.font = resources.get_font(join('..', 'graphics', 'ui', 'runescape_uf.ttf'), 48)
+        self.button_font = resources.get_font(join('..', 'graphics', 'ui', 'runescape_uf.ttf'), 36)
 
         self.button_text = "Restart"
         self.button_color = pygame.Color(200, 50, 50)
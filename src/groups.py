@@ -1,47 +1,165 @@
 import pygame
 from settings import *
-from sprites import Sprite, Cloud
+from sprites import Cloud
+from tilemap import TileLayer, AnimatedTileLayer, Blit
+from spatial import OrderedGrid, IndexedGroup
 from random import choice, randint
-from hat import Hat, FallingHat
-from data import Data
-from timer_ import Timer
-from typing import Tuple, List, Dict, Union, Optional
+from hat import HatStack, FallingHat
+from timer_ import Timer, TimerState
+from animation import clocks
+from bisect import insort
+from math import floor
+from typing import Any, Callable, Tuple, List, Dict, Union, Optional, Iterator
 
 
-class WorldSprites(pygame.sprite.Group):
-    def __init__(self, data: Data):
+class CameraGroup(IndexedGroup):
+    def __init__(self) -> None:
         super().__init__()
         self.display_surface = pygame.display.get_surface()
-        self.data = data
         self.offset = pygame.Vector2()
+        self.drawn, self.culled = 0, 0
+
+        # one bucket per z, kept in drawing order
+        self.layers: Dict[int, OrderedGrid] = {}
+        self.layer_order: List[int] = []
+
+        # only sprites with an update of their own can move, the others are never re-bucketed
+        self.dynamic: Dict[pygame.sprite.Sprite, None] = {}
+
+        # static tiles are pre-rendered into chunks, drawn before the sprites sharing their z
+        self.tile_layers: Dict[int, Union[TileLayer, AnimatedTileLayer]] = {}
+
+    def get_layer(self, z: int) -> OrderedGrid:
+        if z not in self.layers:
+            self.layers[z] = OrderedGrid(self.get_sort_key(z))
+            insort(self.layer_order, z)
+        return self.layers[z]
+
+    def get_sort_key(self, z: int) -> Callable[[pygame.sprite.Sprite], Any]:
+        # sprites sharing a z are drawn in the order they were added
+        return self.order.__getitem__
+
+    def add_tile(self, pos: Tuple[int, int], surf: pygame.Surface, z: int) -> None:
+        if z not in self.tile_layers:
+            self.tile_layers[z] = TileLayer(z)
+            self.get_layer(z)
+        self.tile_layers[z].add_tile(pos, surf)
+
+    def add_animated_tile(self, pos: Tuple[int, int], frames: List[pygame.Surface], z: int) -> None:
+        # the first tile of a layer decides whether it is animated, static tiles added later go on every frame
+        if z not in self.tile_layers:
+            self.tile_layers[z] = AnimatedTileLayer(z, len(frames))
+            self.get_layer(z)
+        self.tile_layers[z].add_animated_tile(pos, frames)
+
+    def get_tile_memory(self) -> int:
+        return sum(layer.get_memory() for layer in self.tile_layers.values())
+
+    def insert(self, sprite: pygame.sprite.Sprite) -> None:
+        self.get_layer(sprite.z).insert(sprite)
+        if type(sprite).update is not pygame.sprite.Sprite.update:
+            self.dynamic[sprite] = None
+
+    def discard(self, sprite: pygame.sprite.Sprite) -> None:
+        self.layers[sprite.z].remove(sprite)
+        self.dynamic.pop(sprite, None)
+
+    def move_dynamic(self) -> None:
+        for sprite in list(self.dynamic):
+            self.move(sprite)
+
+    def move(self, sprite: pygame.sprite.Sprite) -> None:
+        if sprite not in self.pending:
+            self.layers[sprite.z].move(sprite)
+
+    def center_on(self, target_pos: Tuple[float, float]) -> None:
+        # the camera only moves by whole pixels, every sprite and chunk is offset by the same integers
+        self.offset.x = -(floor(target_pos[0]) - WINDOW_WIDTH // 2)
+        self.offset.y = -(floor(target_pos[1]) - WINDOW_HEIGHT // 2)
+
+    def get_blits(self, z: int, camera_rect: pygame.FRect) -> List[Blit]:
+        # chunks of the layer first, then its sprites, without a Vector2 per sprite
+        blits = self.tile_layers[z].get_blits(camera_rect) if z in self.tile_layers else []
+        offset_x, offset_y = self.offset
+        blits.extend([(sprite.image, (sprite.rect.x + offset_x, sprite.rect.y + offset_y)) for sprite in self.get_visible_sprites(z, camera_rect)])
+        return blits
+
+    def get_camera_rect(self) -> pygame.FRect:
+        return pygame.FRect(-self.offset.x, -self.offset.y, WINDOW_WIDTH, WINDOW_HEIGHT)
+
+    def get_visible_sprites(self, z: int, camera_rect: pygame.FRect) -> List[pygame.sprite.Sprite]:
+        visible_sprites = [sprite for sprite in self.layers[z].query_ordered(camera_rect) if camera_rect.colliderect(sprite.rect)]
+        self.drawn += len(visible_sprites)
+        return visible_sprites
+
+    def start_frame(self) -> pygame.FRect:
+        self.flush()
+        self.drawn = 0
+        return self.get_camera_rect()
+
+    def end_frame(self) -> None:
+        self.culled = len(self.order) - self.drawn
+
+
+class WorldSprites(CameraGroup):
+    def __init__(self):
+        super().__init__()
+
+        # the main layer is y-sorted, only sprites whose centery changed are sorted into their cells again
+        self.y_keys: Dict[pygame.sprite.Sprite, Tuple[float, int]] = {}
+
+    def get_sort_key(self, z: int) -> Callable[[pygame.sprite.Sprite], Any]:
+        return self.y_keys.__getitem__ if z == Z_LAYERS['main'] else super().get_sort_key(z)
+
+    def insert(self, sprite: pygame.sprite.Sprite) -> None:
+        if sprite.z == Z_LAYERS['main']:
+            self.y_keys[sprite] = (sprite.rect.centery, self.order[sprite])
+        super().insert(sprite)
+
+    def discard(self, sprite: pygame.sprite.Sprite) -> None:
+        super().discard(sprite)
+        self.y_keys.pop(sprite, None)
+
+    def move(self, sprite: pygame.sprite.Sprite) -> None:
+        if sprite in self.y_keys and self.y_keys[sprite][0] != sprite.rect.centery:
+            layer = self.layers[sprite.z]
+            layer.remove(sprite)
+            self.y_keys[sprite] = (sprite.rect.centery, self.order[sprite])
+            layer.insert(sprite)
+        else:
+            super().move(sprite)
+
+    def update(self, dt: float) -> None:
+        clocks.update(dt)
+        for sprite in self.sprites():
+            sprite.update(dt)
+        self.move_dynamic()
 
     def draw(self, target_pos: Tuple[int, int]):
-        self.offset.x = -(target_pos[0] - WINDOW_WIDTH / 2)
-        self.offset.y = -(target_pos[1] - WINDOW_HEIGHT / 2)
-
-        # background
-        for sprite in sorted(self, key = lambda sprite: sprite.z):
-            if sprite.z < Z_LAYERS['main']:
-                if sprite.z == Z_LAYERS['path']:
-                    if sprite.level <= self.data.unlocked_level:
-                        self.display_surface.blit(sprite.image, sprite.rect.topleft + self.offset)
-                else:
-                    self.display_surface.blit(sprite.image, sprite.rect.topleft + self.offset)
+        self.center_on(target_pos)
+        camera_rect = self.start_frame()
+        blits: List[Blit] = []
+
+        # background, water and tiles are baked into chunks, locked nodes and paths are only added to the group once unlocked
+        for z in self.layer_order:
+            if z < Z_LAYERS['main']:
+                blits.extend(self.get_blits(z, camera_rect))
 
         # main
-        for sprite in sorted(self, key = lambda sprite: sprite.rect.centery):
-            if sprite.z == Z_LAYERS['main']:
-                if hasattr(sprite, 'icon'):
-                    self.display_surface.blit(sprite.image, sprite.rect.topleft + self.offset + pygame.Vector2(0, -28))
-                else:
-                    self.display_surface.blit(sprite.image, sprite.rect.topleft + self.offset)
+        if Z_LAYERS['main'] in self.layers:
+            offset_x, offset_y = self.offset
+            for sprite in self.get_visible_sprites(Z_LAYERS['main'], camera_rect):
+                icon_y = -28 if hasattr(sprite, 'icon') else 0
+                blits.append((sprite.image, (sprite.rect.x + offset_x, sprite.rect.y + offset_y + icon_y)))
 
+        # one call for the whole frame
+        self.display_surface.fblits(blits)
+        self.end_frame()
 
-class AllSprites(pygame.sprite.Group):
+
+class AllSprites(CameraGroup):
     def __init__(self, width: int, height: int, clouds: Dict[str, Union[List[pygame.Surface], pygame.Surface]], horizon_line: int, bg_tile: Optional[pygame.Surface] = None, top_limit: int = 0):
         super().__init__()
-        self.display_surface = pygame.display.get_surface()
-        self.offset = pygame.Vector2()
         self.width, self.height = width * TILE_SIZE, height * TILE_SIZE
         self.borders: Dict[str, int] = {
             'left': 0,
@@ -51,13 +169,9 @@ class AllSprites(pygame.sprite.Group):
         }
         self.sky = not bg_tile
         self.horizon_line = horizon_line
+        self.bg_tile = bg_tile
 
-        if bg_tile:
-            for col in range(width):
-                for row in range(-int(top_limit / TILE_SIZE) - 1, height):
-                    x, y = col * TILE_SIZE, row * TILE_SIZE
-                    Sprite((x, y), bg_tile, self, -1)
-        else: # Sky
+        if not bg_tile: # Sky
             self.large_cloud = clouds['large']
             self.small_clouds = clouds['small']
             self.cloud_direction = -1
@@ -76,6 +190,26 @@ class AllSprites(pygame.sprite.Group):
                 surf = choice(self.small_clouds)
                 Cloud(pos, surf, self)
 
+    def save_state(self) -> Tuple[float, Optional[TimerState]]:
+        # the clouds themselves are sprites of the group, only the large cloud and the spawn timer are kept here
+        if self.sky:
+            return self.large_cloud_x, self.cloud_timer.save_state()
+        return 0, None
+
+    def restore_state(self, state: Tuple[float, Optional[TimerState]]) -> None:
+        if self.sky:
+            self.large_cloud_x, cloud_timer = state
+            self.cloud_timer.restore_state(cloud_timer)
+
+    def build_bg(self) -> Iterator[None]:
+        # the bg tile covers the whole level, yielding after every tile like Level.setup
+        if self.bg_tile:
+            for col in range(self.width // TILE_SIZE):
+                for row in range(-int(self.borders['top'] / TILE_SIZE) - 1, self.height // TILE_SIZE):
+                    x, y = col * TILE_SIZE, row * TILE_SIZE
+                    self.add_tile((x, y), self.bg_tile, -1)
+                    yield
+
     def camera_constraint(self) -> None:
         self.offset.x = self.offset.x if self.offset.x < self.borders['left'] else self.borders['left']
         self.offset.x = self.offset.x if self.offset.x > self.borders['right'] else self.borders['right'] 
@@ -107,8 +241,7 @@ class AllSprites(pygame.sprite.Group):
         Cloud(pos, surf, self)
 
     def draw(self, target_pos: Tuple[int, int], dt: float) -> None:
-        self.offset.x = -(target_pos[0] - WINDOW_WIDTH / 2)
-        self.offset.y = -(target_pos[1] - WINDOW_HEIGHT / 2)
+        self.center_on(target_pos)
         self.camera_constraint()
 
         if self.sky:
@@ -116,12 +249,20 @@ class AllSprites(pygame.sprite.Group):
             self.draw_sky()
             self.draw_large_cloud(dt)
 
-        for sprite in sorted(self, key = lambda sprite: sprite.z):
-            offset_pos = sprite.rect.topleft + self.offset
-            self.display_surface.blit(sprite.image, offset_pos)
-            
+        # static tiles of a layer are drawn before the sprites sharing its z, all of them in one call
+        camera_rect = self.start_frame()
+        blits: List[Blit] = []
+        for z in self.layer_order:
+            blits.extend(self.get_blits(z, camera_rect))
+        self.display_surface.fblits(blits)
+        self.end_frame()
+
     def update(self, dt: float) -> None:
+        clocks.update(dt)
         for sprite in self.sprites():
-            if not isinstance(sprite, Hat) and not isinstance(sprite, FallingHat):
+            if not isinstance(sprite, HatStack) and not isinstance(sprite, FallingHat):
                 sprite.update(dt)
+
+        # hats are moved by the player, so the moving sprites are re-bucketed once all updates are done
+        self.move_dynamic()
                 
\ No newline at end of file
@@ -1,56 +1,81 @@
 import pygame
 from typing import List, Tuple, Dict, Union
 from settings import *
+from transforms import flip, rotate
 
 
-class HatGroup(pygame.sprite.Group):
-    def __init__(self, frames: Dict[str, List[pygame.Surface]]) -> None:
-        super().__init__()
+class HatStack(pygame.sprite.Sprite):
+    def __init__(
+        self, pos: Tuple[float, float], frames: Dict[str, List[pygame.Surface]], 
+        groups: Union[List[pygame.sprite.Group], pygame.sprite.Group], count: int
+    ) -> None:
+        super().__init__(groups)
         self.frames = frames
+        self.pos, self.count = pos, count
+        self.state, self.frame_index, self.facing_right = 'idle', 0, True
 
-    def sprites(self) -> List['Hat']:
-        return super().sprites()
+        # On surélève chaque chapeau de 10% par rapport au précédent
+        self.hat_width, self.hat_height = self.frames['idle_hat'][0].get_size()
+        self.step = self.hat_height * 0.1
 
-    def add_hat(self, pos: Tuple[int, int], groups: Union[List[pygame.sprite.Group], pygame.sprite.Group], state: str) -> None:
-        hats_number = len(self.sprites())
-        pos = self.get_pos(pos, hats_number, self.frames[f"{state}_hat"][0].get_size()[1])
-        groups = groups if isinstance(groups, List) else [groups]
-        self.add(Hat(
-            pos, self.frames, groups, state
-        ))
+        # the whole stack is one surface, built once per look, only for the current number of hats
+        self.surfaces: Dict[Tuple[str, int, bool], pygame.Surface] = {}
+        self.surfaces_count = count
+        self.refresh()
+        self.z = Z_LAYERS['main']
 
-    def get_pos(self, pos: Tuple[int, int], index: int, height: int) -> Tuple[int, int]:
-        return (pos[0], pos[1] - (height * 0.1 * (index + 1)))  # On surélève chaque chapeau de 10% par rapport au précédent
+    def get_hat_image(self) -> pygame.Surface:
+        image = self.frames[f"{self.state}_hat"][self.frame_index]
+        return image if self.facing_right else flip(image, True, False)
 
-    def update(self, pos: Tuple[int, int], frame_index: float, state: str, facing_right: bool) -> None:
-        for i, hat in enumerate(self.sprites()):
-            new_pos = self.get_pos(pos, i, hat.image.get_size()[1])
-            hat.rect.topleft = new_pos
-            hat.update(frame_index, state, facing_right)
+    def get_surface(self) -> pygame.Surface:
+        if self.count != self.surfaces_count:
+            self.surfaces.clear()
+            self.surfaces_count = self.count
 
+        key = (self.state, self.frame_index, self.facing_right)
+        if key not in self.surfaces:
+            height = int(self.hat_height + self.step * (self.count - 1)) if self.count else 0
+            surf = pygame.Surface((self.hat_width, height), pygame.SRCALPHA)
+            image = self.get_hat_image()
+            for i in range(self.count):
+                surf.blit(image, (0, int(self.step * (self.count - 1 - i))))
+            self.surfaces[key] = surf
+        return self.surfaces[key]
 
-class Hat(pygame.sprite.Sprite):
-    def __init__(
-        self, pos: Tuple[int, int], frames: Dict[str, List[pygame.Surface]], 
-        groups: Union[List[pygame.sprite.Group], pygame.sprite.Group], state: str
-    ) -> None:
-        super().__init__(groups)
-        self.frames, self.frame_index = frames, 0.0
-        self.image = self.frames[f"{state}_hat"][int(self.frame_index)]
-        self.rect = self.image.get_frect(topleft=pos)
-        self.z = Z_LAYERS['main']
+    def get_top_center(self) -> Tuple[float, float]:
+        return (self.rect.centerx, self.rect.top + self.hat_height / 2)
 
-    def update(self, frame_index: float, state: str, facing_right: bool) -> None:
-        self.frame_index = frame_index
-        self.image = self.frames[f"{state}_hat"][int(self.frame_index) % len(self.frames[f"{state}_hat"])]
-        self.image = self.image if facing_right else pygame.transform.flip(self.image, True, False)
+    def refresh(self) -> None:
+        self.image = self.get_surface()
+        self.rect = self.image.get_frect(topleft = (self.pos[0], self.pos[1] - self.step * self.count))
+
+    def add_hat(self) -> None:
+        self.count += 1
+        self.refresh()
+
+    def remove_hat(self) -> None:
+        self.count -= 1
+        self.refresh()
+
+    def save_state(self) -> Tuple[Tuple[float, float], int, str, int, bool]:
+        return self.pos, self.count, self.state, self.frame_index, self.facing_right
+
+    def restore_state(self, state: Tuple[Tuple[float, float], int, str, int, bool]) -> None:
+        self.pos, self.count, self.state, self.frame_index, self.facing_right = state
+        self.refresh()
+
+    def update(self, pos: Tuple[float, float], frame_index: float, state: str, facing_right: bool) -> None:
+        self.pos, self.state, self.facing_right = pos, state, facing_right
+        self.frame_index = int(frame_index) % len(self.frames[f"{state}_hat"])
+        self.refresh()
 
 
 class FallingHat(pygame.sprite.Sprite):
     def __init__(self, image: pygame.Surface, pos: Tuple[int, int], groups: List[pygame.sprite.Group]) -> None:
         super().__init__(*groups)
         self.original_image = image
-        self.image = image.copy()
+        self.image = image
         self.rect = self.image.get_frect(center=pos)
         self.velocity = pygame.Vector2(100, -300)
         self.gravity = 1000
@@ -58,13 +83,21 @@ class FallingHat(pygame.sprite.Sprite):
         self.rotation_speed = 360
         self.z = Z_LAYERS['fg']
 
+    def save_state(self) -> Tuple[pygame.Surface, pygame.FRect, pygame.Vector2, float]:
+        return self.image, self.rect.copy(), self.velocity.copy(), self.rotation
+
+    def restore_state(self, state: Tuple[pygame.Surface, pygame.FRect, pygame.Vector2, float]) -> None:
+        self.image, rect, velocity, self.rotation = state
+        self.rect = rect.copy()
+        self.velocity.update(velocity)
+
     def update(self, dt: float, level_bottom: float) -> None:
         self.velocity.y += self.gravity * dt
         displacement = self.velocity * dt
         self.rect.centerx += displacement.x
         self.rect.centery += displacement.y
         self.rotation = (self.rotation + self.rotation_speed * dt) % 360
-        self.image = pygame.transform.rotate(self.original_image, self.rotation)
+        self.image = rotate(self.original_image, self.rotation)
         self.rect = self.image.get_frect(center=self.rect.center)
 
         if self.rect.top > level_bottom:
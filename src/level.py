@@ -1,13 +1,18 @@
 import pygame
 import pytmx
 from settings import *
-from sprites import Sprite, MovingSprite, AnimatedSprite, Spike, Item, ParticleEffectSprite
+from sprites import Sprite, Block, MovingSprite, AnimatedSprite, Spike, Item, ParticleEffectSprite
 from player import Player
 from groups import AllSprites
+from collision import CollisionSprites, HitboxSprites, SolidMap
 from enemies import Tooth, Shell, Pearl
 from data import Data
+from transforms import flip_frames
+from compiled_level import CompiledMap
+from snapshot import Snapshot
 from random import uniform
-from typing import Dict, List, Union, Callable, Any, Tuple, Optional
+from time import perf_counter
+from typing import Dict, List, Union, Callable, Any, Tuple, Optional, Iterator
 
 
 LevelFrames = Dict[
@@ -22,9 +27,10 @@ LevelFrames = Dict[
 
 class Level:
     def __init__(
-        self, tmx_map: pytmx.TiledMap, 
+        self, tmx_map: Union[pytmx.TiledMap, CompiledMap], 
         level_frames: LevelFrames, audio_files: Dict[str, pygame.Sound], 
-        data: Data, switch_stage: Callable[[str, Optional[int]], None], reset: Callable[[], None]
+        data: Data, switch_stage: Callable[[str, Optional[int]], None], reset: Callable[[], None],
+        incremental: bool = False
     ) -> None:
         self.display_surface = pygame.display.get_surface()
         self.data = data
@@ -54,14 +60,14 @@ class Level:
             },
             horizon_line = tmx_level_properties['horizon_line']
         )
-        self.collision_sprites = pygame.sprite.Group()
-        self.semi_collision_sprites = pygame.sprite.Group()
+        self.collision_sprites = CollisionSprites()
+        self.semi_collision_sprites = CollisionSprites()
         self.damage_sprites = pygame.sprite.Group()
         self.tooth_sprites = pygame.sprite.Group()
         self.pearl_sprites = pygame.sprite.Group()
         self.item_sprites = pygame.sprite.Group()
-
-        self.setup(tmx_map, level_frames, audio_files)
+        self.hitbox_sprites = HitboxSprites()
+        self.solid_map = SolidMap(tmx_map.width, tmx_map.height)
 
         # frames
         self.pearl_surf = level_frames['pearl']
@@ -74,21 +80,56 @@ class Level:
         self.damage_sound.set_volume(0.5)
         self.pearl_sound = audio_files['pearl']
 
+        # the map is turned into sprites by a resumable job, at once unless a transition drives it with build
+        self.ready = False
+        self.builder = self.setup(tmx_map, level_frames, audio_files)
+        if not incremental:
+            self.build()
+
     def start(self) -> None:
         self.running = True
 
     def pause(self) -> None:
         self.running = False
 
-    def setup(self, tmx_map: pytmx.TiledMap, level_frames: LevelFrames, audio_files: List[pygame.Sound]):
+    def build(self, budget: Optional[float] = None) -> bool:
+        # resumes setup until it is done or the budget, in seconds, is spent
+        deadline = perf_counter() + budget if budget is not None else None
+        for _ in self.builder:
+            if deadline is not None and perf_counter() >= deadline:
+                return False
+        if not self.ready:
+            self.start_snapshot = self.snapshot()
+            self.ready = True
+        return True
+
+    def get_groups(self) -> List[pygame.sprite.AbstractGroup]:
+        return [
+            self.all_sprites, self.collision_sprites, self.semi_collision_sprites, self.damage_sprites, self.tooth_sprites,
+            self.pearl_sprites, self.item_sprites, self.hitbox_sprites, self.player.falling_hats_group
+        ]
+
+    def snapshot(self) -> Snapshot:
+        return Snapshot(self.get_groups(), [self.all_sprites, self.data])
+
+    def restore(self, snapshot: Snapshot) -> None:
+        snapshot.restore()
+
+        # sprites are back where they were, the spatial indexes follow
+        for sprite in self.all_sprites:
+            self.all_sprites.move(sprite)
+        self.hitbox_sprites.refresh()
+
+    def restart(self) -> None:
+        self.restore(self.start_snapshot)
+
+    def setup(self, tmx_map: Union[pytmx.TiledMap, CompiledMap], level_frames: LevelFrames, audio_files: List[pygame.Sound]) -> Iterator[None]:
+        # yields after every tile and object, so that build can stop between any two of them
+        yield from self.all_sprites.build_bg()
+
         # tiles
         for layer in ['BG', 'Terrain', 'FG', 'Platforms']:
             for x, y, surf in tmx_map.get_layer_by_name(layer).tiles():
-                groups = [self.all_sprites]
-                if layer == 'Terrain':
-                    groups.append(self.collision_sprites)
-                if layer == 'Platforms':
-                    groups.append(self.semi_collision_sprites)
                 match layer:
                     case 'BG':
                         z = Z_LAYERS['bg tiles']
@@ -97,7 +138,19 @@ class Level:
                     case _:
                         z = Z_LAYERS['main']
 
-                Sprite((x * TILE_SIZE, y * TILE_SIZE), surf, groups, z)
+                # static tiles are baked into chunks, platforms keep a sprite to collide with
+                pos = (x * TILE_SIZE, y * TILE_SIZE)
+                self.all_sprites.add_tile(pos, surf, z)
+                if layer == 'Terrain':
+                    self.solid_map.add_tile(x, y)
+                if layer == 'Platforms':
+                    Sprite(pos, surf, self.semi_collision_sprites, z)
+                yield
+
+        # terrain collides as merged rectangles rather than one rect per tile
+        for rect in self.solid_map.merge_rects():
+            Block(rect, self.collision_sprites)
+        yield
 
         # bg details
         for obj in tmx_map.get_layer_by_name('BG details'):
@@ -107,6 +160,7 @@ class Level:
                 AnimatedSprite((obj.x, obj.y), level_frames[obj.name], self.all_sprites, Z_LAYERS['bg tiles'])
                 if obj.name == 'candle':
                     AnimatedSprite((obj.x, obj.y) + pygame.Vector2(-20,-20), level_frames['candle_light'], self.all_sprites, Z_LAYERS['bg tiles'])
+            yield
 
         # objects
         for obj in tmx_map.get_layer_by_name('Objects'):
@@ -124,19 +178,20 @@ class Level:
                 )
             else:
                 if obj.name in ('barrel', 'crate'):
-                    Sprite((obj.x, obj.y), obj.image, (self.all_sprites, self.collision_sprites))
+                    sprite = Sprite((obj.x, obj.y), obj.image, (self.all_sprites, self.collision_sprites))
+                    self.solid_map.add_rect(sprite.rect)
                 else:
                     # frames
                     frames = level_frames[obj.name] if not 'palm' in obj.name else level_frames['palms'][obj.name]
                     if obj.name == 'floor_spike' and obj.properties['inverted']:
-                        frames = [pygame.transform.flip(frame, False, True) for frame in frames]
+                        frames = flip_frames(frames, False, True)
 
                     # groups
                     groups = [self.all_sprites]
                     if obj.name in ('palm_small', 'palm_large'):
                         groups.append(self.semi_collision_sprites)
                     if obj.name in ('saw', 'floor_spike'):
-                        groups.append(self.damage_sprites)
+                        groups.extend((self.damage_sprites, self.hitbox_sprites))
 
                     # z index
                     z = Z_LAYERS['main'] if not 'bg' in obj.name else Z_LAYERS['bg details']
@@ -147,6 +202,7 @@ class Level:
 
             if obj.name == 'flag':
                 self.level_finish_rect = pygame.FRect((obj.x, obj.y), (obj.width, obj.height))
+            yield
 
         # moving objects
         for obj in tmx_map.get_layer_by_name('Moving Objects'):
@@ -158,7 +214,7 @@ class Level:
 					speed = obj.properties['speed'],
 					start_angle = obj.properties['start_angle'],
 					end_angle = obj.properties['end_angle'],
-					groups = (self.all_sprites, self.damage_sprites)
+					groups = (self.all_sprites, self.damage_sprites, self.hitbox_sprites)
                 )
                 for radius in range(0, obj.properties['radius'], 20):
                     Spike(
@@ -173,7 +229,7 @@ class Level:
                     )
             else:
                 frames = level_frames[obj.name]
-                groups = (self.all_sprites, self.semi_collision_sprites) if obj.properties['platform'] else (self.all_sprites, self.damage_sprites)
+                groups = (self.all_sprites, self.semi_collision_sprites) if obj.properties['platform'] else (self.all_sprites, self.damage_sprites, self.hitbox_sprites)
                 if obj.width > obj.height:  # horizontal
                     move_dir = 'x'
                     start_pos = (obj.x, obj.y + obj.height / 2)
@@ -196,14 +252,15 @@ class Level:
                         top, bottom = int(start_pos[1]), int(end_pos[1])
                         for y in range(top, bottom, 20):
                             Sprite((x, y), level_frames['saw_chain'], self.all_sprites, Z_LAYERS['bg details'])
+            yield
 
         # enemies
         for obj in tmx_map.get_layer_by_name('Enemies'):
             if obj.name == 'tooth':
-                Tooth((obj.x, obj.y), level_frames['tooth'], (self.all_sprites, self.damage_sprites, self.tooth_sprites), self.collision_sprites)
+                Tooth((obj.x, obj.y), level_frames['tooth'], (self.all_sprites, self.damage_sprites, self.tooth_sprites, self.hitbox_sprites), self.solid_map)
             
             if obj.name == 'shell':
-                Shell(
+                shell = Shell(
                     pos = (obj.x, obj.y), 
 					frames = level_frames['shell'], 
 					groups = (self.all_sprites, self.collision_sprites), 
@@ -211,10 +268,13 @@ class Level:
 					player = self.player, 
 					create_pearl = self.create_pearl
                 )
+                self.solid_map.add_rect(shell.rect)
+            yield
 
         # items
         for obj in tmx_map.get_layer_by_name('Items'):
-            Item(obj.name, (obj.x + TILE_SIZE / 2, obj.y + TILE_SIZE / 2), level_frames['items'][obj.name], (self.all_sprites, self.item_sprites), self.data)
+            Item(obj.name, (obj.x + TILE_SIZE / 2, obj.y + TILE_SIZE / 2), level_frames['items'][obj.name], (self.all_sprites, self.item_sprites, self.hitbox_sprites), self.data)
+            yield
 
         # water
         for obj in tmx_map.get_layer_by_name('Water'):
@@ -228,20 +288,21 @@ class Level:
                         AnimatedSprite((x, y), level_frames['water_top'], self.all_sprites, Z_LAYERS['water'])
                     else:
                         Sprite((x, y), level_frames['water_body'], self.all_sprites, Z_LAYERS['water'])
+                yield
 
     def create_pearl(self, pos: Tuple[int, int], direction: str) -> None:
-        Pearl(pos, (self.all_sprites, self.damage_sprites, self.pearl_sprites), self.pearl_surf, direction, 150)
+        Pearl(pos, (self.all_sprites, self.damage_sprites, self.pearl_sprites, self.hitbox_sprites), self.pearl_surf, direction, 150)
         self.pearl_sound.play()
 
     def pearl_collision(self) -> None:
-        for sprite in self.collision_sprites:
-            sprite = pygame.sprite.spritecollide(sprite, self.pearl_sprites, True)
-            if sprite:
-                ParticleEffectSprite((sprite[0].rect.center), self.particles_frames, self.all_sprites)
+        for pearl in self.pearl_sprites:
+            if self.solid_map.collide_rect(pearl.rect):
+                pearl.kill()
+                ParticleEffectSprite((pearl.rect.center), self.particles_frames, self.all_sprites)
 
     def hit_collision(self) -> None:
-        for sprite in self.damage_sprites:
-            if sprite.rect.colliderect(self.player.hitbox_rect):
+        for sprite in self.hitbox_sprites.query(self.player.hitbox_rect):
+            if sprite in self.damage_sprites and sprite.rect.colliderect(self.player.hitbox_rect):
                 self.player.get_damage()
                 self.damage_sound.play()
                 if hasattr(sprite, 'pearl'):
@@ -249,21 +310,30 @@ class Level:
                     ParticleEffectSprite((sprite.rect.center), self.particles_frames, self.all_sprites)
 
     def item_collision(self) -> None:
-        if self.item_sprites:
-            item_sprites = pygame.sprite.spritecollide(self.player, self.item_sprites, True)
-            if item_sprites:
-                item_sprites[0].activate()
-                ParticleEffectSprite((item_sprites[0].rect.center), self.particles_frames, self.all_sprites)
-                self.coin_sound.play()
+        # every touched item is picked up, only the oldest one is activated
+        collected, collected_order = None, 0
+        for sprite in self.hitbox_sprites.query(self.player.rect):
+            if sprite in self.item_sprites and sprite.rect.colliderect(self.player.rect):
+                if collected is None or self.hitbox_sprites.order[sprite] < collected_order:
+                    collected, collected_order = sprite, self.hitbox_sprites.order[sprite]
+                sprite.kill()
+        if collected:
+            collected.activate()
+            ParticleEffectSprite((collected.rect.center), self.particles_frames, self.all_sprites)
+            self.coin_sound.play()
 
     def attack_collision(self) -> None:
-        for target in self.pearl_sprites.sprites() + self.tooth_sprites.sprites():
-            facing_target = (
-                (self.player.rect.centerx < target.rect.centerx and self.player.facing_right) or 
-                (self.player.rect.centerx > target.rect.centerx and not self.player.facing_right)
-            )
-            if target.rect.colliderect(self.player.rect) and self.player.attacking and facing_target:
-                target.reverse()
+        if not self.player.attacking:
+            return
+
+        for target in self.hitbox_sprites.query(self.player.rect):
+            if target in self.pearl_sprites or target in self.tooth_sprites:
+                facing_target = (
+                    (self.player.rect.centerx < target.rect.centerx and self.player.facing_right) or 
+                    (self.player.rect.centerx > target.rect.centerx and not self.player.facing_right)
+                )
+                if target.rect.colliderect(self.player.rect) and facing_target:
+                    target.reverse()
 
     def check_constraint(self) -> None:
         # left right
@@ -278,14 +348,25 @@ class Level:
             self.switch_stage('overworld', -1)
 
     def run(self, dt: float) -> None:
+        # still being built behind the transition
+        if not self.ready:
+            return
+
         if self.running:
             self.display_surface.fill('black')
-
-            self.all_sprites.update(dt)
-            self.pearl_collision()
-            self.hit_collision()
-            self.item_collision()
-            self.attack_collision()
-            self.check_constraint()
+        self.update(dt)
 
         self.all_sprites.draw(self.player.hitbox_rect.center, dt)
+
+    def update(self, dt: float) -> None:
+        # one step of the game itself, a headless simulation calls it without drawing anything
+        if not self.ready or not self.running:
+            return
+
+        self.all_sprites.update(dt)
+        self.hitbox_sprites.refresh()
+        self.pearl_collision()
+        self.hit_collision()
+        self.item_collision()
+        self.attack_collision()
+        self.check_constraint()
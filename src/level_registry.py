@@ -0,0 +1,69 @@
+import pytmx
+from settings import *
+from loader import decode_tmx, finish_tmx
+from compiled_level import CompiledMap, decode_level
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, Future
+from os import listdir
+from os.path import join, splitext
+from typing import Dict, List, Union
+
+LevelKey = Union[int, str]
+LevelMap = Union[pytmx.TiledMap, CompiledMap]
+
+
+class LevelRegistry:
+    def __init__(self, path: str = join('..', 'data', 'levels'), memory_limit: int = LEVEL_CACHE_BYTES) -> None:
+        self.memory_limit = memory_limit
+
+        # numbered maps are keyed by their number, like the overworld stages, the others by name
+        self.paths: Dict[LevelKey, str] = {}
+        for file_name in sorted(listdir(path)):
+            name, extension = splitext(file_name)
+            if extension == '.tmx':
+                self.paths[int(name) if name.isdigit() else name] = join(path, file_name)
+
+        # least recently used first
+        self.maps: OrderedDict[LevelKey, LevelMap] = OrderedDict()
+
+        # prefetched maps are parsed on a worker and converted on the main thread when they are needed
+        self.decode = decode_level if USE_COMPILED_LEVELS else decode_tmx
+        self.executor = ThreadPoolExecutor(max_workers = 1)
+        self.pending: Dict[LevelKey, Future] = {}
+
+    def __contains__(self, key: LevelKey) -> bool:
+        return key in self.paths
+
+    def keys(self) -> List[LevelKey]:
+        return list(self.paths)
+
+    def get(self, key: LevelKey) -> LevelMap:
+        if key in self.maps:
+            self.maps.move_to_end(key)
+            return self.maps[key]
+
+        future = self.pending.pop(key, None)
+        tmx_map = finish_tmx(future.result() if future else self.decode(self.paths[key]))
+        self.store(key, tmx_map)
+        return tmx_map
+
+    def prefetch(self, key: LevelKey) -> None:
+        if key in self.paths and key not in self.maps and key not in self.pending:
+            self.pending[key] = self.executor.submit(self.decode, self.paths[key])
+
+    def update(self) -> None:
+        # finishes the prefetched maps that are ready, so that entering them later costs nothing
+        for key in [key for key, future in self.pending.items() if future.done()]:
+            self.store(key, finish_tmx(self.pending.pop(key).result()))
+
+    def store(self, key: LevelKey, tmx_map: LevelMap) -> None:
+        self.maps[key] = tmx_map
+
+        # the newest map always stays, even on its own above the limit
+        while len(self.maps) > 1 and self.get_memory() > self.memory_limit:
+            self.maps.popitem(last = False)
+
+    def get_memory(self) -> int:
+        # tiles are shared between maps, each surface only counts once
+        images = {id(image): image for tmx_map in self.maps.values() for image in tmx_map.images if image}
+        return sum(image.get_width() * image.get_height() * image.get_bytesize() for image in images.values())
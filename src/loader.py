@@ -0,0 +1,80 @@
+import pytmx
+from settings import *
+from tilesets import tilesets
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
+from typing import Any, Callable, List
+
+
+class PendingAsset:
+    def __init__(self, future: Future, finish: Callable[[Any], Any]) -> None:
+        self.future = future
+        self.finish = finish
+        self.finished = False
+        self.result: Any = None
+
+    def resolve(self) -> Any:
+        # the finishing step touches the display format, so it only ever runs on the main thread
+        if not self.finished:
+            self.result = self.finish(self.future.result())
+            self.finished = True
+        return self.result
+
+
+class AssetLoader:
+    def __init__(self, workers: int = LOADER_WORKERS) -> None:
+        # without workers every asset is decoded as soon as it is submitted, like before
+        self.executor = ThreadPoolExecutor(max_workers = workers) if workers else None
+        self.assets: List[PendingAsset] = []
+
+    def submit(self, decode: Callable[..., Any], *args: Any, finish: Callable[[Any], Any] = lambda result: result) -> PendingAsset:
+        if self.executor:
+            future = self.executor.submit(decode, *args)
+        else:
+            future = Future()
+            future.set_result(decode(*args))
+        asset = PendingAsset(future, finish)
+        self.assets.append(asset)
+        return asset
+
+    def get_progress(self) -> float:
+        if not self.assets:
+            return 1.0
+        return sum(asset.finished for asset in self.assets) / len(self.assets)
+
+    def is_done(self) -> bool:
+        return all(asset.finished for asset in self.assets)
+
+    def update(self, timeout: float) -> None:
+        # waits for at least one decode to land, then finishes everything that is ready
+        pending = [asset.future for asset in self.assets if not asset.future.done()]
+        if pending:
+            wait(pending, timeout = timeout, return_when = FIRST_COMPLETED)
+        for asset in self.assets:
+            if asset.future.done():
+                asset.resolve()
+
+    def resolve(self, assets: Any) -> Any:
+        # swaps every pending asset for its result, dicts and lists are updated in place since they can be shared
+        if isinstance(assets, PendingAsset):
+            return assets.resolve()
+        if isinstance(assets, dict):
+            for key, value in assets.items():
+                assets[key] = self.resolve(value)
+        elif isinstance(assets, list):
+            for index, value in enumerate(assets):
+                assets[index] = self.resolve(value)
+        return assets
+
+    def shutdown(self) -> None:
+        if self.executor:
+            self.executor.shutdown()
+
+
+def decode_tmx(path: str) -> pytmx.TiledMap:
+    # tiles are cut without being converted, finish_tmx does that later on the main thread
+    return pytmx.TiledMap(path, image_loader = tilesets.image_loader)
+
+
+def finish_tmx(tmx_map: pytmx.TiledMap) -> pytmx.TiledMap:
+    tmx_map.images = [tilesets.finish(image) if image else image for image in tmx_map.images]
+    return tmx_map
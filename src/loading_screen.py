@@ -0,0 +1,19 @@
+import pygame
+
+
+class LoadingScreen:
+    def __init__(self, surface: pygame.Surface) -> None:
+        self.surface = surface
+        self.bg_color = pygame.Color(0, 0, 0)
+        self.bar_color = pygame.Color(255, 255, 255)
+
+        self.bar_rect = pygame.FRect(0, 0, surface.get_width() // 2, 24)
+        self.bar_rect.center = (surface.get_width() // 2, surface.get_height() // 2)
+
+    def draw(self, progress: float) -> None:
+        self.surface.fill(self.bg_color)
+        pygame.draw.rect(self.surface, self.bar_color, self.bar_rect, 2)
+
+        fill_rect = self.bar_rect.inflate(-8, -8)
+        fill_rect.width *= progress
+        pygame.draw.rect(self.surface, self.bar_color, fill_rect)
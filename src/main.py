@@ -1,9 +1,7 @@
 import sys
 import pygame
-import pytmx
 from settings import *
 from level import Level
-from pytmx.util_pygame import load_pygame
 from os.path import join
 from support import *
 from data import Data
@@ -12,6 +10,12 @@ from overworld import Overworld
 from transition import Transition
 from gameover_layer import GameoverLayer
 from menu import Menu
+from transforms import prepare_silhouettes
+from bundle import load_bundle
+from loader import AssetLoader, decode_tmx, finish_tmx
+from loading_screen import LoadingScreen
+from resources import resources
+from level_registry import LevelRegistry
 
 
 class Game:
@@ -21,45 +25,57 @@ class Game:
         pygame.display.set_caption("One Life Climber")
         self.clock = pygame.time.Clock()
         self.transition = Transition(self.display_surface)
+
+        # files are decoded on worker threads while the main thread keeps a progress bar on screen
+        self.loading_screen = LoadingScreen(self.display_surface)
+        self.loading_screen.draw(0)
+        pygame.display.update()
+        self.loader = AssetLoader(LOADER_WORKERS)
+        use_loader(self.loader)
         self.import_assets()
+        self.tmx_overworld = self.loader.submit(decode_tmx, join('..', 'data', 'overworld', 'overworld.tmx'), finish = finish_tmx)
+        self.finish_loading()
+
+        # level maps are parsed on first use, the one under the overworld icon ahead of time
+        self.levels = LevelRegistry()
 
         self.ui = UI(self.font, self.ui_frames)
         self.game_over_layer = GameoverLayer(self.display_surface, self.reset)
         self.menu = Menu(self.display_surface, on_continue=self.resume_game, on_quit=self.close, on_open=self.open_menu)
         self.data = Data(self.ui, self.create_hat, self.remove_hat)
-        self.tmx_maps: Dict[int, pytmx.TiledMap] = {
-            0: load_pygame(join('..', 'data', 'levels', '0.tmx')),
-			1: load_pygame(join('..', 'data', 'levels', '1.tmx')),
-			2: load_pygame(join('..', 'data', 'levels', '2.tmx')),
-			3: load_pygame(join('..', 'data', 'levels', '3.tmx')),
-			4: load_pygame(join('..', 'data', 'levels', '4.tmx')),
-			5: load_pygame(join('..', 'data', 'levels', '5.tmx')),
-        }
-        self.tmx_overworld = load_pygame(join('..', 'data', 'overworld', 'overworld.tmx'))
-        self.current_stage = Overworld(self.tmx_overworld, self.data, self.overworld_frames, self.start_stage_transition)
+        # built once, it only catches up with the data whenever it is shown again
+        self.overworld = Overworld(self.tmx_overworld, self.data, self.overworld_frames, self.start_stage_transition, self.levels.prefetch)
+        self.current_stage = self.overworld
         self.bg_music.play(-1)
 
     def start_stage_transition(self, target: str, unlock: int = 0) -> None:
         if not self.transition.active:
             self.transition.start(
-                on_midpoint=lambda: self.switch_stage(target, unlock),
-                on_complete=lambda: self.start_level()
+                on_midpoint=lambda: self.switch_stage(target, unlock, incremental=True),
+                on_complete=lambda: self.start_level(),
+                load=self.build_stage
             )
 
     def start_level(self) -> None:
         if isinstance(self.current_stage, Level):
             self.current_stage.start()
 
-    def switch_stage(self, target: str, unlock: int = 0) -> None:
+    def build_stage(self, budget: float) -> bool:
+        if isinstance(self.current_stage, Level):
+            return self.current_stage.build(budget)
+        return True
+
+    def switch_stage(self, target: str, unlock: int = 0, incremental: bool = False) -> None:
         if target == 'level':
-            self.current_stage = Level(self.tmx_maps[self.data.current_level], self.level_frames, self.audio_files, self.data, self.start_stage_transition, self.reset)
+            self.current_stage = Level(self.levels.get(self.data.current_level), self.level_frames, self.audio_files, self.data, self.start_stage_transition, self.reset, incremental)
         else:  # overworld
             if unlock > 0:
                 self.data.unlocked_level = 6
             else:
                 self.data.unlocked_level += 1
             
-            self.current_stage = Overworld(self.tmx_overworld, self.data, self.overworld_frames, self.start_stage_transition)
+            self.overworld.refresh(self.data)
+            self.current_stage = self.overworld
 
     def create_hat(self) -> None:
         if isinstance(self.current_stage, Level):
@@ -70,6 +86,37 @@ class Game:
             self.current_stage.player.remove_hat()
 
     def import_assets(self) -> None:
+        # the music takes the longest to decode, so it is queued before anything else
+        self.import_audio()
+        self.import_graphics()
+
+    def finish_loading(self) -> None:
+        while not self.loader.is_done():
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    self.close()
+            self.loader.update(1 / 60)
+            self.loading_screen.draw(self.loader.get_progress())
+            pygame.display.update()
+        use_loader(None)
+        self.loader.shutdown()
+
+        self.level_frames = self.loader.resolve(self.level_frames)
+        self.ui_frames = self.loader.resolve(self.ui_frames)
+        self.overworld_frames = self.loader.resolve(self.overworld_frames)
+        self.audio_files = self.loader.resolve(self.audio_files)
+        self.bg_music = self.loader.resolve(self.bg_music)
+        self.tmx_overworld = self.loader.resolve(self.tmx_overworld)
+        resources.resolve(self.loader.resolve)
+
+        prepare_silhouettes({key: frames for key, frames in self.level_frames['player'].items() if 'hat' not in key})
+        self.audio_files["jump"].set_volume(0.2)
+        self.bg_music.set_volume(0.5)
+
+    def import_graphics(self) -> None:
+        if USE_ASSET_BUNDLE:
+            use_bundle(load_bundle())
+
         self.level_frames = {
             'flag': import_folder('..', 'graphics', 'level', 'flag'),
 			'saw': import_folder('..', 'graphics', 'enemies', 'saw', 'animation'),
@@ -81,7 +128,6 @@ class Game:
 			'small_chain': import_folder('..', 'graphics','level', 'small_chains'),
 			'candle_light': import_folder('..', 'graphics','level', 'candle light'),
 			'player': import_sub_folders('..', 'graphics','player'),
-			'saw': import_folder('..', 'graphics', 'enemies', 'saw', 'animation'),
 			'saw_chain': import_image('..',  'graphics', 'enemies', 'saw', 'saw_chain'),
 			'helicopter': import_folder('..', 'graphics', 'level', 'helicopter'),
 			'boat': import_folder('..',  'graphics', 'objects', 'boat'),
@@ -98,8 +144,7 @@ class Game:
 			'cloud_small': import_folder('..', 'graphics','level', 'clouds', 'small'),
 			'cloud_large': import_image('..', 'graphics','level', 'clouds', 'large_cloud'),
         }
-
-        self.font = pygame.font.Font(join('..', 'graphics', 'ui', 'runescape_uf.ttf'), 40)
+        self.font = resources.get_font(join('..', 'graphics', 'ui', 'runescape_uf.ttf'), 40)
         
         self.ui_frames = {
 			'coin':import_image('..', 'graphics', 'ui', 'coin'),
@@ -113,17 +158,15 @@ class Game:
 			'icon': import_sub_folders('..', 'graphics', 'overworld', 'icon'),
 		}
 
+    def import_audio(self) -> None:
+        self.bg_music = import_sound('..', 'audio', 'starlight_city.mp3')
         self.audio_files = {
-			'coin': pygame.mixer.Sound(join('..', 'audio', 'coin.wav')),
-			'attack': pygame.mixer.Sound(join('..', 'audio', 'attack.wav')),
-			'jump': pygame.mixer.Sound(join('..', 'audio', 'jump.wav')), 
-			'damage': pygame.mixer.Sound(join('..', 'audio', 'damage.wav')),
-			'pearl': pygame.mixer.Sound(join('..', 'audio', 'pearl.wav')),
+			'coin': import_sound('..', 'audio', 'coin.wav'),
+			'attack': import_sound('..', 'audio', 'attack.wav'),
+			'jump': import_sound('..', 'audio', 'jump.wav'), 
+			'damage': import_sound('..', 'audio', 'damage.wav'),
+			'pearl': import_sound('..', 'audio', 'pearl.wav'),
 		}
-        self.audio_files["jump"].set_volume(0.2)
-
-        self.bg_music = pygame.mixer.Sound(join('..', 'audio', 'starlight_city.mp3'))
-        self.bg_music.set_volume(0.5)
 
     def check_game_over(self) -> None:
         if self.data.health <= 0:
@@ -131,13 +174,26 @@ class Game:
                 self.current_stage.pause()
             self.game_over_layer.show()
 
-        elif isinstance(self.current_stage, Level) and self.current_stage.player.hitbox_rect.bottom > self.current_stage.level_bottom:
+        elif isinstance(self.current_stage, Level) and self.current_stage.ready and self.current_stage.player.hitbox_rect.bottom > self.current_stage.level_bottom:
             self.current_stage.pause()
             self.game_over_layer.show()
 
+    def restart_level(self) -> None:
+        # the level is played again from the state it was entered in, without being built again
+        if isinstance(self.current_stage, Level):
+            self.current_stage.restart()
+            self.current_stage.start()
+            self.game_over_layer.hide()
+
     def reset(self) -> None:
+        # one life: a game over starts a new game, unless retrying the level is enabled
+        if RESTART_LEVEL_ON_GAME_OVER and isinstance(self.current_stage, Level):
+            self.restart_level()
+            return
+
         self.data = Data(self.ui, self.create_hat, self.remove_hat)
-        self.current_stage = Overworld(self.tmx_overworld, self.data, self.overworld_frames, self.start_stage_transition)
+        self.overworld.refresh(self.data)
+        self.current_stage = self.overworld
         self.game_over_layer.hide()
 
     def close(self) -> None: 
@@ -163,17 +219,25 @@ class Game:
                 self.menu.handle_event(event)
                 self.game_over_layer.handle_event(event)
 
-            self.check_game_over()
+            self.step(dt)
+            pygame.display.update()
+
+    def step(self, dt: float, draw: bool = True) -> None:
+        # one frame of the game, a headless simulation steps it without drawing
+        self.check_game_over()
+        self.levels.update()
+        if draw:
             self.current_stage.run(dt)
             self.ui.update(dt, self.data.health, self.data.coins)
-            self.transition.update(dt)
-            self.menu.update()
+        else:
+            self.current_stage.update(dt)
+        self.transition.update(dt)
+        self.menu.update()
+        if draw:
             self.transition.draw()
             self.menu.draw()
             self.game_over_layer.draw()
 
-            pygame.display.update()
-
 
 if __name__ == "__main__":
     game = Game()
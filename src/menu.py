@@ -1,5 +1,7 @@
 import pygame
 from os.path import join
+from resources import resources
+from controls import get_just_pressed
 from typing import Callable
 
 
@@ -13,8 +15,8 @@ class Menu:
         self.on_quit = on_quit
         self.on_open = on_open
 
-        self.font = pygame.font.Font(join('..', 'graphics', 'ui', 'runescape_uf.ttf'), 48)
-        self.button_font = pygame.font.Font(join('..', 'graphics', 'ui', 'runescape_uf.ttf'), 36)
+        self.font = resources.get_font(join('..', 'graphics', 'ui', 'runescape_uf.ttf'), 48)
+        self.button_font = resources.get_font(join('..', 'graphics', 'ui', 'runescape_uf.ttf'), 36)
 
         self.bg_color = pygame.Color(0, 0, 0, 180)
         self.text_color = pygame.Color(255, 255, 255)
@@ -48,7 +50,7 @@ class Menu:
                 self.on_quit()
 
     def update(self) -> None:
-        keys = pygame.key.get_just_pressed()
+        keys = get_just_pressed()
 
         if keys[pygame.K_ESCAPE] and not self.visible:
             self.on_open()
@@ -0,0 +1,59 @@
+from settings import *
+from sprites import Node
+from math import inf
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+Point = Tuple[int, int]
+
+# path id, level at the other end and the points leading there
+Edge = Tuple[int, int, List[Point]]
+
+
+class NodeGraph:
+    def __init__(self, nodes: Iterable[Node], paths: Dict[int, Dict[str, Any]]) -> None:
+        # nodes by grid cell, finding the one under the icon is a lookup instead of a collision test
+        self.cells: Dict[Point, Node] = {node.grid_pos: node for node in nodes}
+        self.nodes: Dict[int, Node] = {node.level: node for node in self.cells.values()}
+
+        # the Paths layer only gives the points, the properties of each node say which way they are walked
+        self.edges: Dict[int, Dict[str, Edge]] = {}
+        for level, node in self.nodes.items():
+            self.edges[level] = {}
+            for direction, (path_id, reverse) in node.paths.items():
+                points = paths[path_id]['pos'][::-1] if reverse else paths[path_id]['pos'][:]
+                self.edges[level][direction] = (path_id, self.get_node(points[-1]).level, points)
+
+        # chained points from one level to another, over the unlocked paths only
+        self.routes: Dict[Tuple[int, int], List[Point]] = {}
+        self.unlocked_level = -1
+
+    def get_node(self, pos: Tuple[float, float]) -> Optional[Node]:
+        return self.cells.get((int(pos[0] // TILE_SIZE), int(pos[1] // TILE_SIZE)))
+
+    def get_route(self, start: int, end: int) -> Optional[List[Point]]:
+        return self.routes.get((start, end))
+
+    def refresh(self, unlocked_level: int) -> None:
+        # shortest routes between every pair of levels (floyd-warshall), only computed again once paths are unlocked or lost
+        if unlocked_level == self.unlocked_level:
+            return
+        self.unlocked_level = unlocked_level
+
+        levels = list(self.nodes)
+        distances = {(start, end): 0 if start == end else inf for start in levels for end in levels}
+        routes: Dict[Tuple[int, int], List[Point]] = {}
+        for level, edges in self.edges.items():
+            for path_id, target, points in edges.values():
+                length = sum(abs(end[0] - start[0]) + abs(end[1] - start[1]) for start, end in zip(points, points[1:]))
+                if path_id <= unlocked_level and length < distances[level, target]:
+                    distances[level, target] = length
+                    routes[level, target] = points
+
+        for via in levels:
+            for start in levels:
+                for end in levels:
+                    if distances[start, via] + distances[via, end] < distances[start, end]:
+                        distances[start, end] = distances[start, via] + distances[via, end]
+                        # both halves share the point of the node in the middle
+                        routes[start, end] = routes[start, via] + routes[via, end][1:]
+        self.routes = routes
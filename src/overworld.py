@@ -3,9 +3,11 @@ import pytmx
 from settings import *
 from sprites import Sprite, AnimatedSprite, Node, Icon, PathSprite
 from groups import WorldSprites
+from node_graph import NodeGraph
+from controls import get_pressed
 from data import Data
 from random import randint
-from typing import Callable, Optional, Dict, List, Union
+from typing import Callable, Optional, Dict, List, Tuple, Union
 
 
 OverworldFrames = Dict[
@@ -21,33 +23,82 @@ OverworldFrames = Dict[
 class Overworld:
     def __init__(
         self, tmx_map: pytmx.TiledMap, data: Data, 
-        overworld_frames: OverworldFrames, switch_stage: Callable[[str, Optional[int]], None]
+        overworld_frames: OverworldFrames, switch_stage: Callable[[str, Optional[int]], None],
+        prefetch_level: Callable[[int], None] = lambda level: None
     ) -> None:
         self.display_surface = pygame.display.get_surface()
         self.data = data
         self.switch_stage = switch_stage
+        self.prefetch_level = prefetch_level
 
         # groups
-        self.all_sprites = WorldSprites(data)
+        self.all_sprites = WorldSprites()
         self.node_sprites = pygame.sprite.Group()
 
-        self.setup(tmx_map, overworld_frames)
+        # nodes and path sprites per level, only the unlocked ones are in all_sprites
+        self.level_sprites: Dict[int, List[pygame.sprite.Sprite]] = {}
+        self.unlocked_level = -1
 
-        self.current_node = [node for node in self.node_sprites if node.level == 0][0]
+        self.setup(tmx_map, overworld_frames)
 
         self.path_frames = overworld_frames['path']
         self.create_path_sprites()
+        self.graph = NodeGraph(self.node_sprites, self.paths)
+
+        self.current_node = [node for node in self.node_sprites if node.level == 0][0]
+        self.refresh(data)
+
+    def refresh(self, data: Data) -> None:
+        # the overworld is built once, this catches up with the levels unlocked or lost and the level left since
+        self.data = data
+        for node in self.node_sprites:
+            node.data = data
+
+        if self.data.unlocked_level > self.unlocked_level:
+            for level in range(self.unlocked_level + 1, self.data.unlocked_level + 1):
+                self.all_sprites.add(*self.level_sprites.get(level, []))
+        else:
+            for level in range(self.data.unlocked_level + 1, self.unlocked_level + 1):
+                self.all_sprites.remove(*self.level_sprites.get(level, []))
+        self.unlocked_level = self.data.unlocked_level
+        self.graph.refresh(self.unlocked_level)
+
+        # the icon waits on the node of the current level
+        for node in self.node_sprites:
+            if node.level == self.data.current_level:
+                self.current_node = node
+                self.icon.rect.center = node.rect.center
+                self.icon.path = None
+                self.icon.find_path()
+                self.icon.get_state()
+        self.prefetch_level(self.data.current_level)
+
+    def add_level_sprite(self, sprite: pygame.sprite.Sprite, level: int) -> None:
+        if level not in self.level_sprites:
+            self.level_sprites[level] = []
+        self.level_sprites[level].append(sprite)
+
+    def add_tile(self, pos: Tuple[float, float], surf: pygame.Surface, z: int) -> None:
+        # paths and nodes are sprites drawn between the baked layers, so the draw order stays the same
+        if BAKE_OVERWORLD_BACKGROUND:
+            self.all_sprites.add_tile(pos, surf, z)
+        else:
+            Sprite(pos, surf, self.all_sprites, z)
 
     def setup(self, tmx_map: pytmx.TiledMap, overworld_frames: OverworldFrames) -> None:
         # water
         for col in range(tmx_map.width):
             for row in range(tmx_map.height):
-                AnimatedSprite((col * TILE_SIZE, row * TILE_SIZE), overworld_frames['water'], self.all_sprites, Z_LAYERS['bg tiles'])
+                pos = (col * TILE_SIZE, row * TILE_SIZE)
+                if BAKE_OVERWORLD_BACKGROUND:
+                    self.all_sprites.add_animated_tile(pos, overworld_frames['water'], Z_LAYERS['bg tiles'])
+                else:
+                    AnimatedSprite(pos, overworld_frames['water'], self.all_sprites, Z_LAYERS['bg tiles'])
 
         # tiles
         for layer in ['main', 'top']:
             for x, y, surf in tmx_map.get_layer_by_name(layer).tiles():
-                Sprite((x * TILE_SIZE, y * TILE_SIZE), surf, self.all_sprites, Z_LAYERS['bg tiles'])
+                self.add_tile((x * TILE_SIZE, y * TILE_SIZE), surf, Z_LAYERS['bg tiles'])
 
         # objects
         for obj in tmx_map.get_layer_by_name('Objects'):
@@ -55,7 +106,7 @@ class Overworld:
                 AnimatedSprite((obj.x, obj.y), overworld_frames['palms'], self.all_sprites, Z_LAYERS['main'], randint(4, 6))
             else:
                 z = Z_LAYERS[f'{'bg details' if obj.name == 'grass' else 'bg tiles'}']
-                Sprite((obj.x, obj.y), obj.image, self.all_sprites, z)
+                self.add_tile((obj.x, obj.y), obj.image, z)
 
         # paths
         self.paths = {}
@@ -74,14 +125,15 @@ class Overworld:
             # nodes
             if obj.name == 'Node':
                 available_paths = {k:v for k,v in obj.properties.items() if k in ('left', 'right', 'up', 'down')}
-                Node(
+                node = Node(
                     pos = (obj.x, obj.y),
                     surf = overworld_frames['path']['node'],
-                    groups = (self.all_sprites, self.node_sprites),
+                    groups = self.node_sprites,
                     level = obj.properties['stage'],
                     data = self.data,
                     paths = available_paths
                 )
+                self.add_level_sprite(node, node.level)
 
     def create_path_sprites(self) -> None:
 		# get tiles from path 
@@ -134,15 +186,16 @@ class Overworld:
                         else:
                             surf = self.path_frames['horizontal']
 
-                    PathSprite(
+                    path_sprite = PathSprite(
 						pos = (tile.x * TILE_SIZE, tile.y * TILE_SIZE), 
 						surf = surf, 
-						groups = self.all_sprites, 
+						groups = [], 
 						level = key
                     )
+                    self.add_level_sprite(path_sprite, key)
 
     def input(self) -> None:
-        keys = pygame.key.get_pressed()
+        keys = get_pressed()
         if self.current_node and not self.icon.path:
             if keys[pygame.K_s] and self.current_node.can_move('down'):
                 self.move('down')
@@ -152,24 +205,37 @@ class Overworld:
                 self.move('right')
             if keys[pygame.K_z] and self.current_node.can_move('up'):
                 self.move('up')
+            for level in self.graph.nodes:
+                if keys[pygame.K_0 + level]:
+                    self.travel(level)
             if keys[pygame.K_RETURN]:
                 self.data.current_level = self.current_node.level
                 self.switch_stage('level')
 
     def move(self, direction: str) -> None:
-        path_key = int(self.current_node.paths[direction][0])
-        path_reverse = True if self.current_node.paths[direction][-1] == 'r' else False
-        path = self.paths[path_key]['pos'][:] if not path_reverse else self.paths[path_key]['pos'][::-1]
+        _, _, path = self.graph.edges[self.current_node.level][direction]
         self.icon.start_move(path)
 
+    def travel(self, level: int) -> None:
+        # a level further away is reached along the precomputed route, through every node in between
+        route = self.graph.get_route(self.current_node.level, level)
+        if route:
+            self.prefetch_level(level)
+            self.icon.start_move(route)
+
     def get_current_node(self) -> None:
-        nodes = pygame.sprite.spritecollide(self.icon, self.node_sprites, False)
-        if nodes:
-            self.current_node = nodes[0]
+        node = self.graph.get_node(self.icon.rect.center)
+        if node:
+            if node is not self.current_node:
+                self.prefetch_level(node.level)
+            self.current_node = node
 
-    def run(self, dt: float) -> None:
+    def update(self, dt: float) -> None:
         self.input()
         self.get_current_node()
-        self.display_surface.fill('black')
         self.all_sprites.update(dt)
+
+    def run(self, dt: float) -> None:
+        self.update(dt)
+        self.display_surface.fill('black')
         self.all_sprites.draw(self.icon.rect.center)
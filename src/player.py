@@ -1,16 +1,19 @@
 import pygame
 from settings import *
-from timer_ import Timer
-from hat import HatGroup, FallingHat
+from timer_ import Timer, ticks
+from controls import get_pressed
+from hat import HatStack, FallingHat
+from collision import CollisionSprites
+from transforms import flip, silhouette
 from data import Data
 from math import sin
-from typing import Dict, List, Tuple, Union
+from typing import Any, Dict, List, Tuple, Union
 
 
 class Player(pygame.sprite.Sprite):
     def __init__(
         self, pos: Tuple[int, int], groups: Union[pygame.sprite.Group, List[pygame.sprite.Group]], 
-        collision_sprites: pygame.sprite.Group, semi_collision_sprites: pygame.sprite.Group, 
+        collision_sprites: CollisionSprites, semi_collision_sprites: CollisionSprites, 
         frames: Dict[str, List[pygame.Surface]], data: Data, 
         attack_sound: pygame.Sound, jump_sound: pygame.Sound, level_bottom: int
     ) -> None:
@@ -26,7 +29,6 @@ class Player(pygame.sprite.Sprite):
         self.state, self.facing_right = 'idle', True
         self.image = self.frames[self.state][self.frame_index]
 
-        self.hat_sprites = HatGroup(self.hat_frames)
         self.falling_hats_group = pygame.sprite.Group()
 
         # rects
@@ -36,8 +38,7 @@ class Player(pygame.sprite.Sprite):
 
         # hats
         # On "retire" un chapeau PV car le sprite de base du personnage à déjà un chapeau sur lui
-        for i in range(self.data.health - 1):
-            self.hat_sprites.add_hat(pos, groups, self.state)
+        self.hat_stack = HatStack(pos, self.hat_frames, groups, self.data.health - 1)
 
         # movement
         self.direction = pygame.Vector2()
@@ -70,23 +71,43 @@ class Player(pygame.sprite.Sprite):
         self.attack_sound = attack_sound
         self.jump_sound = jump_sound
 
+    def save_state(self) -> Tuple[Any, ...]:
+        return (
+            self.rect.copy(), self.hitbox_rect.copy(), self.old_rect.copy(), self.direction.copy(),
+            self.image, self.frame_index, self.state, self.facing_right,
+            self.jump, self.attacking, self.on_surface.copy(), self.platform,
+            {name: timer.save_state() for name, timer in self.timers.items()}
+        )
+
+    def restore_state(self, state: Tuple[Any, ...]) -> None:
+        (
+            rect, hitbox_rect, old_rect, direction,
+            self.image, self.frame_index, self.state, self.facing_right,
+            self.jump, self.attacking, on_surface, self.platform,
+            timers
+        ) = state
+        self.rect.update(rect)
+        self.hitbox_rect.update(hitbox_rect)
+        self.old_rect = old_rect.copy()
+        self.direction.update(direction)
+        self.on_surface = on_surface.copy()
+        for name, timer in timers.items():
+            self.timers[name].restore_state(timer)
+
     def add_hat(self) -> None:
-        self.hat_sprites.add_hat(self.rect.topleft, self.groups(), self.state)
+        self.hat_stack.add_hat()
 
     def remove_hat(self) -> None:
-        if self.hat_sprites.sprites():
-            hat = self.hat_sprites.sprites()[-1]
-            self.hat_sprites.remove(hat)
-
+        if self.hat_stack.count:
             falling_hat = FallingHat(
-                image=hat.image,
-                pos=hat.rect.center,
+                image=self.hat_stack.get_hat_image(),
+                pos=self.hat_stack.get_top_center(),
                 groups=[self.groups(), self.falling_hats_group]
             )
-            hat.kill()
+            self.hat_stack.remove_hat()
 
     def input(self) -> None:
-        keys = pygame.key.get_pressed()
+        keys = get_pressed()
         input_vector = pygame.Vector2(0, 0)
 
         if not self.timers['wall jump'].active:
@@ -155,8 +176,9 @@ class Player(pygame.sprite.Sprite):
         floor_rect = pygame.Rect(self.hitbox_rect.bottomleft,(self.hitbox_rect.width,2))
         right_rect = pygame.Rect(self.hitbox_rect.topright + pygame.Vector2(0,self.hitbox_rect.height / 4), (2,self.hitbox_rect.height / 2))
         left_rect  = pygame.Rect(self.hitbox_rect.topleft + pygame.Vector2(-2,self.hitbox_rect.height / 4), (2,self.hitbox_rect.height / 2))
-        collide_rects = [sprite.rect for sprite in self.collision_sprites]
-        semi_collide_rect = [sprite.rect for sprite in self.semi_collision_sprites]
+        contact_area = self.hitbox_rect.inflate(6, 6)
+        collide_rects = [sprite.rect for sprite in self.collision_sprites.query(contact_area)]
+        semi_collide_rect = [sprite.rect for sprite in self.semi_collision_sprites.query(contact_area)]
 
 		# collisions 
         self.on_surface['floor'] = True if floor_rect.collidelist(collide_rects) >= 0 or floor_rect.collidelist(semi_collide_rect) >= 0 and self.direction.y >= 0 else False
@@ -164,13 +186,13 @@ class Player(pygame.sprite.Sprite):
         self.on_surface['left']  = True if left_rect.collidelist(collide_rects)  >= 0 else False
 
         self.platform = None
-        sprites =  self.collision_sprites.sprites() + self.semi_collision_sprites.sprites()
-        for sprite in [sprite for sprite in sprites if hasattr(sprite, 'moving')]:
-            if sprite.rect.colliderect(floor_rect):
-                self.platform = sprite
+        for group in (self.collision_sprites, self.semi_collision_sprites):
+            for sprite in group.get_dynamic():
+                if sprite.rect.colliderect(floor_rect):
+                    self.platform = sprite
 
     def collision(self, axis: str) -> None:
-        for sprite in self.collision_sprites:
+        for sprite in self.collision_sprites.query(self.hitbox_rect):
             if sprite.rect.colliderect(self.hitbox_rect):
                 if axis == 'horizontal':
 					# left
@@ -194,7 +216,7 @@ class Player(pygame.sprite.Sprite):
 
     def semi_collision(self) -> None:
         if not self.timers['platform skip'].active:
-            for sprite in self.semi_collision_sprites:
+            for sprite in self.semi_collision_sprites.query(self.hitbox_rect):
                 if sprite.rect.colliderect(self.hitbox_rect):
                     if self.hitbox_rect.bottom >= sprite.rect.top and int(self.old_rect.bottom) <= sprite.old_rect.top:
                         self.hitbox_rect.bottom = sprite.rect.top
@@ -210,7 +232,7 @@ class Player(pygame.sprite.Sprite):
         if self.state == 'attack' and self.frame_index >= len(self.frames[self.state]):
             self.state = 'idle'
         self.image = self.frames[self.state][int(self.frame_index % len(self.frames[self.state]))]
-        self.image = self.image if self.facing_right else pygame.transform.flip(self.image, True, False)
+        self.image = self.image if self.facing_right else flip(self.image, True, False)
 
         if self.attacking and self.frame_index > len(self.frames[self.state]):
             self.attacking = False
@@ -236,11 +258,8 @@ class Player(pygame.sprite.Sprite):
             self.timers['hit'].activate()
 
     def flicker(self) -> None:
-        if self.timers['hit'].active and sin(pygame.time.get_ticks() * 100) >= 0:
-            white_mask = pygame.mask.from_surface(self.image)
-            white_surf = white_mask.to_surface()
-            white_surf.set_colorkey('black')
-            self.image = white_surf
+        if self.timers['hit'].active and sin(ticks.get() * 100) >= 0:
+            self.image = silhouette(self.image)
 
     def update(self, dt: float) -> None:
         self.old_rect = self.hitbox_rect.copy()
@@ -248,7 +267,7 @@ class Player(pygame.sprite.Sprite):
 
         self.input()
         self.move(dt)
-        self.hat_sprites.update(self.rect.topleft, self.frame_index, self.state, self.facing_right)
+        self.hat_stack.update(self.rect.topleft, self.frame_index, self.state, self.facing_right)
         self.falling_hats_group.update(dt, self.level_bottom)
         self.platform_move(dt)
         self.check_contact()
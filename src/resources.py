@@ -0,0 +1,81 @@
+import pygame
+from settings import *
+from io import BytesIO
+from os.path import normpath
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+RESOURCE_CATEGORIES = ('fonts', 'images', 'frames', 'sounds')
+
+
+class Resource:
+    def __init__(self, value: Any) -> None:
+        self.value = value
+        self.count = 0
+
+
+class ResourceManager:
+    def __init__(self) -> None:
+        self.caches: Dict[str, Dict[Hashable, Resource]] = {category: {} for category in RESOURCE_CATEGORIES}
+
+        # a font file is read once, every size is then opened from the bytes in memory
+        self.font_data: Dict[str, bytes] = {}
+
+    def acquire(self, category: str, key: Hashable, load: Callable[[], Any]) -> Any:
+        cache = self.caches[category]
+        if key not in cache:
+            cache[key] = Resource(load())
+        cache[key].count += 1
+        return cache[key].value
+
+    def release(self, category: str, key: Hashable) -> None:
+        cache = self.caches[category]
+        cache[key].count -= 1
+        if cache[key].count <= 0:
+            del cache[key]
+            if category == 'fonts' and not any(path == key[0] for path, _ in cache):
+                del self.font_data[key[0]]
+
+    def get_font(self, path: str, size: int) -> pygame.font.Font:
+        path = normpath(path)
+        return self.acquire('fonts', (path, size), lambda: pygame.font.Font(BytesIO(self.get_font_data(path)), size))
+
+    def release_font(self, path: str, size: int) -> None:
+        self.release('fonts', (normpath(path), size))
+
+    def get_font_data(self, path: str) -> bytes:
+        if path not in self.font_data:
+            with open(path, 'rb') as file:
+                self.font_data[path] = file.read()
+        return self.font_data[path]
+
+    def resolve(self, resolve: Callable[[Any], Any]) -> None:
+        # swaps the assets still pending on the loader for their results
+        for cache in self.caches.values():
+            for resource in cache.values():
+                resource.value = resolve(resource.value)
+
+    def get_size(self, value: Any) -> int:
+        if isinstance(value, pygame.Surface):
+            return value.get_width() * value.get_height() * value.get_bytesize()
+        if isinstance(value, pygame.mixer.Sound):
+            frequency, size, channels = pygame.mixer.get_init()
+            return int(value.get_length() * frequency) * channels * abs(size) // 8
+        if isinstance(value, dict):
+            return sum(self.get_size(item) for item in value.values())
+        if isinstance(value, list):
+            return sum(self.get_size(item) for item in value)
+        return 0
+
+    def get_resident_bytes(self) -> Dict[str, int]:
+        # pixels and samples held by each cache, fonts count the file kept in memory
+        resident = {category: sum(self.get_size(resource.value) for resource in cache.values()) for category, cache in self.caches.items()}
+        resident['fonts'] = sum(len(data) for data in self.font_data.values())
+        return resident
+
+    def get_counts(self) -> Dict[str, Tuple[int, int]]:
+        # (cached entries, references to them) per category
+        return {category: (len(cache), sum(resource.count for resource in cache.values())) for category, cache in self.caches.items()}
+
+
+# shared by every module, the game keeps its assets for as long as it runs
+resources = ResourceManager()
@@ -1,6 +1,19 @@
 WINDOW_WIDTH, WINDOW_HEIGHT = 1080, 700
 TILE_SIZE = 64
 ANIMATION_SPEED = 6
+ANIMATION_SPEED_STEP = 0.5
+ROTATION_STEPS = 64  # angles per rotated surface, each rendered once
+ROTATION_CACHE_SIZE = 8  # source surfaces whose rotations are kept, the least recently rotated dropped first
+CHUNK_SIZE = 16  # tiles per side of a pre-rendered chunk
+GRID_CELL_SIZE = TILE_SIZE * 4
+USE_ASSET_BUNDLE = True  # load images from data/assets.bundle, rebuilt when graphics/ changes
+LOADER_WORKERS = 4  # threads decoding assets at startup, 0 decodes them one by one
+SIMULATION_DT = 1 / 60  # seconds per step of a headless simulation, whatever the time it takes to compute
+LEVEL_CACHE_BYTES = 4 * 1024 * 1024  # converted tile images kept for parsed level maps
+USE_COMPILED_LEVELS = True  # load levels from data/cache, compiled again when a map or its tilesets change
+TRANSITION_LOAD_BUDGET = 0.004  # seconds per frame spent building the next level during a transition
+RESTART_LEVEL_ON_GAME_OVER = False  # the restart button replays the level from its snapshot instead of starting a new game
+BAKE_OVERWORLD_BACKGROUND = True  # water, tiles and grass of the overworld drawn from one chunk set per water frame
 
 # layers
 Z_LAYERS = {
@@ -0,0 +1,56 @@
+import os
+
+# no window and no sound card needed, the display surface is only drawn on when asked to
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+from settings import *
+from main import Game
+from level import Level
+from data import Data
+from controls import ScriptedKeys, use_keys
+from timer_ import ticks
+from random import seed as random_seed
+from typing import Callable, Iterable, Optional
+
+# the keys held at each step of a simulation
+KeyScript = Callable[[int], Iterable[int]]
+
+
+class Simulation:
+    def __init__(self, keys: KeyScript = lambda step: (), dt: float = SIMULATION_DT, draw: bool = False, game: Optional[Game] = None) -> None:
+        self.game = game if game else Game()
+        self.script = keys
+        self.dt = dt
+        self.draw = draw
+        self.steps = 0
+
+        # the keyboard and the clock of every timer follow the steps instead of the wall clock
+        self.keys = ScriptedKeys()
+        use_keys(self.keys)
+        ticks.simulate()
+
+    def enter_level(self, level: int, seed: Optional[int] = None) -> Level:
+        # a fresh save and a known seed, so that the same keys always play the same run
+        if seed is not None:
+            random_seed(seed)
+        self.game.data = Data(self.game.ui, self.game.create_hat, self.game.remove_hat)
+        self.game.data.current_level = level
+        self.game.switch_stage('level')
+        self.game.start_level()
+        return self.game.current_stage
+
+    def step(self) -> None:
+        self.keys.press(self.script(self.steps))
+        ticks.advance(self.dt)
+        self.game.step(self.dt, self.draw)
+        self.steps += 1
+
+    def run(self, seconds: float) -> None:
+        # as fast as the CPU allows, every step still moves the game by dt
+        for _ in range(round(seconds / self.dt)):
+            self.step()
+
+    def close(self) -> None:
+        use_keys(None)
+        ticks.stop()
@@ -0,0 +1,32 @@
+import pygame
+from settings import *
+from spatial import IndexedGroup
+from animation import clocks
+from typing import Any, Dict, List, Optional, Tuple
+
+GroupMembers = Tuple[pygame.sprite.AbstractGroup, List[pygame.sprite.Sprite], Optional[Tuple[Dict[pygame.sprite.Sprite, int], int]]]
+
+
+class Snapshot:
+    def __init__(self, groups: List[pygame.sprite.AbstractGroup], objects: List[Any]) -> None:
+        # who belongs to which group, in order, and the state of every sprite or object keeping one
+        self.members: List[GroupMembers] = [
+            (group, group.sprites(), group.get_order() if isinstance(group, IndexedGroup) else None)
+            for group in groups
+        ]
+        sprites = dict.fromkeys(sprite for group in groups for sprite in group)
+        self.states = {obj: obj.save_state() for obj in [*sprites, *objects] if hasattr(obj, 'save_state')}
+        self.clocks = clocks.save_state()
+
+    def restore(self) -> None:
+        # sprites created since are dropped, the ones killed since are added back, nothing is built again
+        for group, sprites, order in self.members:
+            members = set(sprites)
+            group.remove(*[sprite for sprite in group.sprites() if sprite not in members])
+            group.add(*[sprite for sprite in sprites if sprite not in group])
+            if order is not None:
+                group.set_order(order)
+
+        for obj, state in self.states.items():
+            obj.restore_state(state)
+        clocks.restore_state(self.clocks)
@@ -0,0 +1,141 @@
+import pygame
+from settings import *
+from bisect import insort
+from heapq import merge
+from typing import Any, Callable, Tuple, Dict, List, Set, Iterator, Union, Optional
+
+
+Bounds = Tuple[int, int, int, int]
+
+
+class SpatialGrid:
+    def __init__(self, cell_size: int = GRID_CELL_SIZE) -> None:
+        self.cell_size = cell_size
+        self.cells: Dict[Tuple[int, int], Set[pygame.sprite.Sprite]] = {}
+        self.bounds: Dict[pygame.sprite.Sprite, Bounds] = {}
+
+    def get_bounds(self, rect: Union[pygame.Rect, pygame.FRect]) -> Bounds:
+        return (
+            int(rect.left // self.cell_size), int(rect.top // self.cell_size),
+            int(rect.right // self.cell_size), int(rect.bottom // self.cell_size)
+        )
+
+    def get_keys(self, bounds: Bounds) -> Iterator[Tuple[int, int]]:
+        left, top, right, bottom = bounds
+        for x in range(left, right + 1):
+            for y in range(top, bottom + 1):
+                yield x, y
+
+    def remove(self, sprite: pygame.sprite.Sprite) -> None:
+        bounds = self.bounds.pop(sprite, None)
+        if bounds:
+            for key in self.get_keys(bounds):
+                cell = self.cells[key]
+                cell.discard(sprite)
+                if not cell:
+                    del self.cells[key]
+
+    def insert(self, sprite: pygame.sprite.Sprite) -> None:
+        bounds = self.bounds[sprite] = self.get_bounds(sprite.rect)
+        for key in self.get_keys(bounds):
+            if key not in self.cells:
+                self.cells[key] = set()
+            self.cells[key].add(sprite)
+
+    def move(self, sprite: pygame.sprite.Sprite) -> None:
+        # only re-bucket when the sprite crossed a cell border
+        if sprite in self.bounds and self.get_bounds(sprite.rect) != self.bounds[sprite]:
+            self.remove(sprite)
+            self.insert(sprite)
+
+    def query(self, rect: Union[pygame.Rect, pygame.FRect], sprites: Optional[Set[pygame.sprite.Sprite]] = None) -> Set[pygame.sprite.Sprite]:
+        # callers querying every frame can hand back the same set to avoid allocating one
+        if sprites is None:
+            sprites = set()
+        else:
+            sprites.clear()
+        for key in self.get_keys(self.get_bounds(rect)):
+            if key in self.cells:
+                sprites.update(self.cells[key])
+        return sprites
+
+
+class OrderedGrid(SpatialGrid):
+    def __init__(self, sort_key: Callable[[pygame.sprite.Sprite], Any], cell_size: int = GRID_CELL_SIZE) -> None:
+        super().__init__(cell_size)
+        # every cell stays sorted, a query merges the cells it covers instead of sorting them again
+        self.sort_key = sort_key
+        self.cells: Dict[Tuple[int, int], List[pygame.sprite.Sprite]] = {}
+
+    def remove(self, sprite: pygame.sprite.Sprite) -> None:
+        bounds = self.bounds.pop(sprite, None)
+        if bounds:
+            for key in self.get_keys(bounds):
+                cell = self.cells[key]
+                cell.remove(sprite)
+                if not cell:
+                    del self.cells[key]
+
+    def insert(self, sprite: pygame.sprite.Sprite) -> None:
+        bounds = self.bounds[sprite] = self.get_bounds(sprite.rect)
+        for key in self.get_keys(bounds):
+            if key not in self.cells:
+                self.cells[key] = []
+            insort(self.cells[key], sprite, key = self.sort_key)
+
+    def query_ordered(self, rect: Union[pygame.Rect, pygame.FRect]) -> Iterator[pygame.sprite.Sprite]:
+        cells = [self.cells[key] for key in self.get_keys(self.get_bounds(rect)) if key in self.cells]
+        previous = None
+        for sprite in merge(*cells, key = self.sort_key):
+            # a sprite over several cells comes out of each of them, one right after the other
+            if sprite is not previous:
+                yield sprite
+            previous = sprite
+
+
+class IndexedGroup(pygame.sprite.Group):
+    def __init__(self) -> None:
+        super().__init__()
+
+        # sprites join their groups before their rect and z exist, they get indexed on the next flush
+        self.pending: Set[pygame.sprite.Sprite] = set()
+
+        # indexes lose the insertion order, which is kept to break ties
+        self.order: Dict[pygame.sprite.Sprite, int] = {}
+        self.order_counter = 0
+
+    def add_internal(self, sprite: pygame.sprite.Sprite, layer: None = None) -> None:
+        super().add_internal(sprite, layer)
+        self.pending.add(sprite)
+        self.order[sprite] = self.order_counter
+        self.order_counter += 1
+
+    def remove_internal(self, sprite: pygame.sprite.Sprite) -> None:
+        super().remove_internal(sprite)
+        if sprite in self.pending:
+            self.pending.remove(sprite)
+        else:
+            self.discard(sprite)
+        del self.order[sprite]
+
+    def insert(self, sprite: pygame.sprite.Sprite) -> None:
+        # hook for the indexes of the subclasses, called once the sprite is flushed
+        pass
+
+    def discard(self, sprite: pygame.sprite.Sprite) -> None:
+        # hook for the indexes of the subclasses, called when an indexed sprite leaves the group
+        pass
+
+    def get_order(self) -> Tuple[Dict[pygame.sprite.Sprite, int], int]:
+        return dict(self.order), self.order_counter
+
+    def set_order(self, state: Tuple[Dict[pygame.sprite.Sprite, int], int]) -> None:
+        # sprites added back by a restore take their old place, before the next flush indexes them
+        order, self.order_counter = state
+        for sprite in self.order:
+            self.order[sprite] = order[sprite]
+
+    def flush(self) -> None:
+        for sprite in sorted(self.pending, key = self.order.__getitem__):
+            self.insert(sprite)
+        self.pending.clear()
@@ -1,6 +1,8 @@
 import pygame
 from settings import *
 from data import Data
+from animation import clocks
+from transforms import flip
 from math import sin, cos, radians
 from random import randint
 from typing import Tuple, Optional, Union, List, Dict
@@ -18,22 +20,35 @@ class Sprite(pygame.sprite.Sprite):
         self.z = z
 
 
-class AnimatedSprite(Sprite):
+class Block(pygame.sprite.Sprite):
+    def __init__(self, rect: pygame.Rect, groups: Union[List[pygame.sprite.Group], pygame.sprite.Group]) -> None:
+        super().__init__(groups)
+        self.rect = pygame.FRect(rect)
+        self.old_rect = self.rect.copy()
+
+
+class AnimatedSprite(pygame.sprite.Sprite):
     def __init__(
         self, pos: Tuple[int, int], frames: List[pygame.Surface], 
         groups: Union[List[pygame.sprite.Group], pygame.sprite.Group], 
         z: int = Z_LAYERS['main'], animation_speed: int = ANIMATION_SPEED
     ) -> None:
-        self.frames, self.frame_index = frames, 0
-        super().__init__(pos, self.frames[self.frame_index], groups, z)
-        self.animation_speed = animation_speed
+        super().__init__(groups)
+        self.frames = frames
+        self.clock = clocks.get_clock(animation_speed)
+        self.start_index = self.clock.frame_index
+        self.rect = self.frames[0].get_frect(topleft = pos)
+        self.old_rect = self.rect.copy()
+        self.z = z
 
-    def animate(self, dt: float) -> None:
-        self.frame_index += self.animation_speed * dt
-        self.image = self.frames[int(self.frame_index % len(self.frames))]
+    @property
+    def frame_index(self) -> float:
+        return self.clock.frame_index - self.start_index
 
-    def update(self, dt: float) -> None:
-        self.animate(dt)
+    @property
+    def image(self) -> pygame.Surface:
+        # only evaluated when something reads the image, in practice when the sprite is drawn
+        return self.frames[int(self.frame_index % len(self.frames))]
 
 
 class Item(AnimatedSprite):
@@ -68,11 +83,12 @@ class ParticleEffectSprite(AnimatedSprite):
         self.rect.center = pos
         self.z = Z_LAYERS['fg']
 
-    def animate(self, dt: float) -> None:
-        self.frame_index += self.animation_speed * dt
-        if self.frame_index < len(self.frames):
-            self.image = self.frames[int(self.frame_index)]
-        else:
+    @property
+    def image(self) -> pygame.Surface:
+        return self.frames[min(int(self.frame_index), len(self.frames) - 1)]
+
+    def update(self, dt: float) -> None:
+        if self.frame_index >= len(self.frames):
             self.kill()
 
 
@@ -120,15 +136,26 @@ class MovingSprite(AnimatedSprite):
                 self.rect.top = self.start_pos[1]
             self.reverse['y'] = True if self.direction.y > 0 else False
 
+    @property
+    def image(self) -> pygame.Surface:
+        image = super().image
+        return flip(image, self.reverse['x'], self.reverse['y']) if self.flip else image
+
+    def save_state(self) -> Tuple[pygame.FRect, pygame.FRect, pygame.Vector2, Dict[str, bool]]:
+        return self.rect.copy(), self.old_rect.copy(), self.direction.copy(), self.reverse.copy()
+
+    def restore_state(self, state: Tuple[pygame.FRect, pygame.FRect, pygame.Vector2, Dict[str, bool]]) -> None:
+        rect, old_rect, direction, reverse = state
+        self.rect.update(rect)
+        self.old_rect = old_rect.copy()
+        self.direction.update(direction)
+        self.reverse = reverse.copy()
+
     def update(self, dt: float) -> None:
         self.old_rect = self.rect.copy()
         self.rect.topleft += self.direction * self.speed * dt
         self.check_border()
 
-        self.animate(dt)
-        if self.flip:
-            self.image = pygame.transform.flip(self.image, self.reverse['x'], self.reverse['y'])
-
 
 class Spike(Sprite):
     def __init__(
@@ -151,6 +178,13 @@ class Spike(Sprite):
         
         super().__init__((x, y), surf, groups, z)
 
+    def save_state(self) -> Tuple[float, int, pygame.FRect]:
+        return self.angle, self.direction, self.rect.copy()
+
+    def restore_state(self, state: Tuple[float, int, pygame.FRect]) -> None:
+        self.angle, self.direction, rect = state
+        self.rect.update(rect)
+
     def update(self, dt: float) -> None:
         self.angle += self.direction * self.speed * dt
 
@@ -175,6 +209,12 @@ class Cloud(Sprite):
         self.direction = -1
         self.rect.midbottom = pos
 
+    def save_state(self) -> pygame.FRect:
+        return self.rect.copy()
+
+    def restore_state(self, state: pygame.FRect) -> None:
+        self.rect.update(state)
+
     def update(self, dt: float) -> None:
         self.rect.x += self.direction * self.speed * dt
 
@@ -193,11 +233,13 @@ class Node(pygame.sprite.Sprite):
         self.z = Z_LAYERS['path']
         self.level = level
         self.data = data
-        self.paths = paths
         self.grid_pos = (int(pos[0] / TILE_SIZE), int(pos[1] / TILE_SIZE))
 
+        # path id per direction, and whether it is walked from its end ('2r')
+        self.paths: Dict[str, Tuple[int, bool]] = {direction: (int(path.rstrip('r')), path.endswith('r')) for direction, path in paths.items()}
+
     def can_move(self, direction: str) -> bool:
-        return direction in list(self.paths.keys()) and int(self.paths[direction][0][0]) <= self.data.unlocked_level
+        return direction in self.paths and self.paths[direction][0] <= self.data.unlocked_level
         
 
 class Icon(pygame.sprite.Sprite):
@@ -209,9 +251,10 @@ class Icon(pygame.sprite.Sprite):
         self.speed = 400
 
         # image
-        self.frames, self.frame_index = frames, 0
+        self.frames = frames
+        self.clock = clocks.get_clock(ANIMATION_SPEED)
+        self.start_index = self.clock.frame_index
         self.state = 'idle'
-        self.image = self.frames[self.state][self.frame_index]
         self.z = Z_LAYERS['main']
 
         # rect
@@ -244,9 +287,10 @@ class Icon(pygame.sprite.Sprite):
             del self.path[0]
             self.find_path()
 
-    def animate(self, dt: float) -> None:
-        self.frame_index += ANIMATION_SPEED * dt
-        self.image = self.frames[self.state][int(self.frame_index % len(self.frames[self.state]))]
+    @property
+    def image(self) -> pygame.Surface:
+        frame_index = self.clock.frame_index - self.start_index
+        return self.frames[self.state][int(frame_index % len(self.frames[self.state]))]
 
     def get_state(self) -> None:
         self.state = 'idle'
@@ -264,7 +308,6 @@ class Icon(pygame.sprite.Sprite):
             self.point_collision()
             self.rect.center += self.direction * self.speed * dt
         self.get_state()
-        self.animate(dt)
 
 
 class PathSprite(Sprite):
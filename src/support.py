@@ -1,30 +1,79 @@
 import pygame
 from settings import *
+from bundle import AssetBundle
+from loader import AssetLoader, PendingAsset
+from resources import resources
 from os import walk
-from os.path import join
-from typing import Tuple, Dict, List
+from os.path import join, normpath
+from typing import Tuple, Dict, List, Optional, Union
+
+# images found in the bundle are taken from it, anything else is still decoded from disk
+asset_bundle: Optional[AssetBundle] = None
+
+# while the game starts, files are decoded on the loader threads and only resolved once they are all in
+asset_loader: Optional[AssetLoader] = None
+
+
+def use_bundle(bundle: Optional[AssetBundle]) -> None:
+    global asset_bundle
+    asset_bundle = bundle
+
+
+def use_loader(loader: Optional[AssetLoader]) -> None:
+    global asset_loader
+    asset_loader = loader
+
+
+def load_image(full_path: str) -> Union[pygame.Surface, PendingAsset]:
+    surface = asset_bundle.get(full_path) if asset_bundle else None
+    if surface is not None:
+        return surface
+    if asset_loader:
+        return asset_loader.submit(pygame.image.load, full_path, finish = pygame.Surface.convert_alpha)
+    return pygame.image.load(full_path).convert_alpha()
+
+
+def load_sound(full_path: str) -> Union[pygame.mixer.Sound, PendingAsset]:
+    if asset_loader:
+        return asset_loader.submit(pygame.mixer.Sound, full_path)
+    return pygame.mixer.Sound(full_path)
+
+
+def import_sound(*path: Tuple[str]) -> pygame.mixer.Sound:
+    full_path = join(*path)
+    return resources.acquire('sounds', normpath(full_path), lambda: load_sound(full_path))
 
 
 def import_image(*path: Tuple[str], alpha: bool = True, format: str = 'png') -> pygame.Surface:
     full_path = join(*path) + f".{format}"
-    return pygame.image.load(full_path).convert_alpha() if alpha else pygame.image.load(full_path).convert()
+    if alpha:
+        return resources.acquire('images', (normpath(full_path), alpha), lambda: load_image(full_path))
+    return resources.acquire('images', (normpath(full_path), alpha), lambda: pygame.image.load(full_path).convert())
 
 
 def import_folder(*path: Tuple[str]) -> List[pygame.Surface]:
+    return resources.acquire('frames', (normpath(join(*path)), 'list'), lambda: load_folder(*path))
+
+
+def load_folder(*path: Tuple[str]) -> List[pygame.Surface]:
     frames = []
     for folder_path, subfolders, image_names in walk(join(*path)):
         for image_name in sorted(image_names, key = lambda name: int(name.split('.')[0])):
             full_path = join(folder_path, image_name)
-            frames.append(pygame.image.load(full_path).convert_alpha())
+            frames.append(load_image(full_path))
     return frames
 
 
 def import_folder_dict(*path: Tuple[str]) -> Dict[str, pygame.Surface]:
+    return resources.acquire('frames', (normpath(join(*path)), 'dict'), lambda: load_folder_dict(*path))
+
+
+def load_folder_dict(*path: Tuple[str]) -> Dict[str, pygame.Surface]:
     frame_dict = {}
     for folder_path, _, image_names in walk(join(*path)):
         for image_name in image_names:
             full_path = join(folder_path, image_name)
-            surface = pygame.image.load(full_path).convert_alpha()
+            surface = load_image(full_path)
             frame_dict[image_name.split('.')[0]] = surface
     return frame_dict
 
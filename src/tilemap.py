@@ -0,0 +1,68 @@
+import pygame
+from settings import *
+from animation import clocks
+from typing import Tuple, Dict, List
+
+# a surface and where it lands on the display, submitted along with the rest of the frame
+Blit = Tuple[pygame.Surface, Tuple[float, float]]
+
+
+class TileLayer:
+    def __init__(self, z: int, chunk_size: int = CHUNK_SIZE) -> None:
+        self.z = z
+        self.chunk_pixels = chunk_size * TILE_SIZE
+        self.chunks: Dict[Tuple[int, int], pygame.Surface] = {}
+
+    def add_tile(self, pos: Tuple[int, int], surf: pygame.Surface) -> None:
+        # a tile bigger than TILE_SIZE can spill over several chunks
+        left, top = int(pos[0]), int(pos[1])
+        right, bottom = left + surf.get_width() - 1, top + surf.get_height() - 1
+        for cx in range(left // self.chunk_pixels, right // self.chunk_pixels + 1):
+            for cy in range(top // self.chunk_pixels, bottom // self.chunk_pixels + 1):
+                chunk = self.get_chunk((cx, cy))
+                chunk.blit(surf, (left - cx * self.chunk_pixels, top - cy * self.chunk_pixels))
+
+    def get_chunk(self, key: Tuple[int, int]) -> pygame.Surface:
+        if key not in self.chunks:
+            self.chunks[key] = pygame.Surface((self.chunk_pixels, self.chunk_pixels), pygame.SRCALPHA).convert_alpha()
+        return self.chunks[key]
+
+    def get_memory(self) -> int:
+        return sum(chunk.get_width() * chunk.get_height() * chunk.get_bytesize() for chunk in self.chunks.values())
+
+    def get_blits(self, camera_rect: pygame.FRect) -> List[Blit]:
+        # the camera is snapped to whole pixels, so chunks land on the same pixels as individually blitted tiles
+        left, top = int(camera_rect.left) // self.chunk_pixels, int(camera_rect.top) // self.chunk_pixels
+        right, bottom = int(camera_rect.right) // self.chunk_pixels, int(camera_rect.bottom) // self.chunk_pixels
+        blits = []
+        for cy in range(top, bottom + 1):
+            for cx in range(left, right + 1):
+                chunk = self.chunks.get((cx, cy))
+                if chunk:
+                    blits.append((chunk, (cx * self.chunk_pixels - camera_rect.left, cy * self.chunk_pixels - camera_rect.top)))
+        return blits
+
+
+class AnimatedTileLayer:
+    def __init__(self, z: int, frame_count: int, animation_speed: float = ANIMATION_SPEED, chunk_size: int = CHUNK_SIZE) -> None:
+        # one full set of chunks per animation frame, static tiles are composited on every one of them
+        self.z = z
+        self.frames = [TileLayer(z, chunk_size) for _ in range(frame_count)]
+        self.clock = clocks.get_clock(animation_speed)
+        self.start_index = self.clock.frame_index
+
+    def add_tile(self, pos: Tuple[int, int], surf: pygame.Surface) -> None:
+        for layer in self.frames:
+            layer.add_tile(pos, surf)
+
+    def add_animated_tile(self, pos: Tuple[int, int], frames: List[pygame.Surface]) -> None:
+        for layer, surf in zip(self.frames, frames):
+            layer.add_tile(pos, surf)
+
+    def get_memory(self) -> int:
+        return sum(layer.get_memory() for layer in self.frames)
+
+    def get_blits(self, camera_rect: pygame.FRect) -> List[Blit]:
+        # same frame as an AnimatedSprite created along with the layer
+        frame_index = self.clock.frame_index - self.start_index
+        return self.frames[int(frame_index % len(self.frames))].get_blits(camera_rect)
@@ -0,0 +1,71 @@
+import pygame
+from settings import *
+from pytmx.util_pygame import handle_transformation, smart_convert
+from threading import Lock
+from weakref import WeakValueDictionary
+from os.path import normpath
+from typing import Any, Callable, Dict, Optional, Tuple, Union
+
+# sheet, rect, flips, colorkey and pixelalpha: whatever changes the converted tile
+TileKey = Tuple[str, Optional[Tuple[int, int, int, int]], Tuple[bool, bool, bool], Optional[str], bool]
+
+# a tile cut from its sheet, converted later on the main thread and cached under its key
+DecodedTile = Tuple[pygame.Surface, Optional[pygame.Color], bool, TileKey]
+
+
+class TilesetCache:
+    def __init__(self) -> None:
+        # tiles only stay while a map holds them, so evicted levels still free theirs
+        self.tiles: WeakValueDictionary[TileKey, pygame.Surface] = WeakValueDictionary()
+
+        # maps are decoded on worker threads while the main thread finishes others
+        self.lock = Lock()
+
+    def get_key(self, filename: str, rect: Any, flags: Any, colorkey: Optional[str], pixelalpha: bool) -> TileKey:
+        flips = (bool(flags.flipped_horizontally), bool(flags.flipped_vertically), bool(flags.flipped_diagonally)) if flags else (False, False, False)
+        return normpath(filename), tuple(rect) if rect else None, flips, colorkey, pixelalpha
+
+    def get(self, key: TileKey) -> Optional[pygame.Surface]:
+        with self.lock:
+            return self.tiles.get(key)
+
+    def image_loader(self, filename: str, colorkey: Optional[str], **kwargs: Any) -> Callable[..., Union[pygame.Surface, DecodedTile]]:
+        # pytmx image loader: tiles another map already converted are reused, the sheet is only decoded on a miss
+        pixelalpha = kwargs.get("pixelalpha", True)
+        color = pygame.Color(f"#{colorkey}") if colorkey else None
+        sheet: Dict[str, pygame.Surface] = {}
+
+        def load_image(rect: Optional[Tuple[int, int, int, int]] = None, flags: Any = None) -> Union[pygame.Surface, DecodedTile]:
+            key = self.get_key(filename, rect, flags, colorkey, pixelalpha)
+            surface = self.get(key)
+            if surface is not None:
+                return surface
+
+            if not sheet:
+                sheet['image'] = pygame.image.load(filename)
+            tile = sheet['image'].subsurface(rect) if rect else sheet['image'].copy()
+            if flags:
+                tile = handle_transformation(tile, flags)
+            return tile, color, pixelalpha, key
+
+        return load_image
+
+    def finish(self, image: Union[pygame.Surface, DecodedTile]) -> pygame.Surface:
+        if isinstance(image, pygame.Surface):
+            return image
+
+        tile, color, pixelalpha, key = image
+        with self.lock:
+            surface = self.tiles.get(key)
+            if surface is None:
+                surface = smart_convert(tile, color, pixelalpha)
+                self.tiles[key] = surface
+        return surface
+
+    def get_memory(self) -> int:
+        with self.lock:
+            return sum(tile.get_width() * tile.get_height() * tile.get_bytesize() for tile in self.tiles.values())
+
+
+# shared by every map the game loads
+tilesets = TilesetCache()
@@ -1,5 +1,31 @@
 from pygame.time import get_ticks
-from typing import Callable
+from typing import Callable, Optional, Tuple
+
+# whether the timer runs, and for how long it has been running
+TimerState = Tuple[bool, Optional[int]]
+
+
+class Ticks:
+    def __init__(self) -> None:
+        # milliseconds from pygame, or advanced by a fixed dt while the game is simulated
+        self.simulated: Optional[float] = None
+
+    def get(self) -> int:
+        return get_ticks() if self.simulated is None else int(self.simulated)
+
+    def simulate(self) -> None:
+        # carries on from the real ticks, a start time of 0 means a timer that was never activated
+        self.simulated = get_ticks()
+
+    def advance(self, dt: float) -> None:
+        self.simulated += dt * 1000
+
+    def stop(self) -> None:
+        self.simulated = None
+
+
+# read by every timer, so that a simulation runs them on its own time
+ticks = Ticks()
 
 
 class Timer:
@@ -12,7 +38,7 @@ class Timer:
 
     def activate(self) -> None:
         self.active = True
-        self.start_time = get_ticks()
+        self.start_time = ticks.get()
 
     def deactivate(self) -> None:
         self.active = False
@@ -20,8 +46,16 @@ class Timer:
         if self.repeat:
             self.activate()
 
+    def save_state(self) -> TimerState:
+        # the time elapsed rather than the start time, so that a restored timer carries on from where it was
+        return self.active, ticks.get() - self.start_time if self.start_time else None
+
+    def restore_state(self, state: TimerState) -> None:
+        self.active, elapsed = state
+        self.start_time = ticks.get() - elapsed if elapsed is not None else 0
+
     def update(self) -> None:
-        current_time = get_ticks()
+        current_time = ticks.get()
         if current_time - self.start_time >= self.duration:
             if self.func and self.start_time != 0:
                 self.func()
@@ -0,0 +1,59 @@
+import pygame
+from settings import *
+from collections import OrderedDict
+from typing import Dict, Tuple, List, Optional
+
+
+# derived surfaces are shared by every sprite using the same source frame
+flipped_surfaces: Dict[Tuple[pygame.Surface, bool, bool], pygame.Surface] = {}
+rotated_surfaces: OrderedDict[Tuple[pygame.Surface, int], List[Optional[pygame.Surface]]] = OrderedDict()
+silhouette_surfaces: Dict[pygame.Surface, pygame.Surface] = {}
+
+
+def flip(surf: pygame.Surface, flip_x: bool, flip_y: bool) -> pygame.Surface:
+    if not flip_x and not flip_y:
+        return surf
+
+    key = (surf, flip_x, flip_y)
+    if key not in flipped_surfaces:
+        flipped_surfaces[key] = pygame.transform.flip(surf, flip_x, flip_y)
+    return flipped_surfaces[key]
+
+
+def flip_frames(frames: List[pygame.Surface], flip_x: bool, flip_y: bool) -> List[pygame.Surface]:
+    return [flip(frame, flip_x, flip_y) for frame in frames]
+
+
+def rotate(surf: pygame.Surface, angle: float, steps: int = ROTATION_STEPS) -> pygame.Surface:
+    # angles are snapped to the nearest step, each one rendered the first time it is used
+    key = (surf, steps)
+    if key in rotated_surfaces:
+        rotated_surfaces.move_to_end(key)
+    else:
+        rotated_surfaces[key] = [None] * steps
+
+        # only the surfaces rotated last are kept, hats can fall from any frame of the player
+        while len(rotated_surfaces) > ROTATION_CACHE_SIZE:
+            rotated_surfaces.popitem(last = False)
+
+    step = round(angle * steps / 360) % steps
+    rotations = rotated_surfaces[key]
+    if rotations[step] is None:
+        rotations[step] = pygame.transform.rotate(surf, step * 360 / steps)
+    return rotations[step]
+
+
+def silhouette(surf: pygame.Surface) -> pygame.Surface:
+    if surf not in silhouette_surfaces:
+        white_surf = pygame.mask.from_surface(surf).to_surface()
+        white_surf.set_colorkey('black')
+        silhouette_surfaces[surf] = white_surf
+    return silhouette_surfaces[surf]
+
+
+def prepare_silhouettes(frames: Dict[str, List[pygame.Surface]]) -> None:
+    # both facings are built up front so that a hit never has to create a surface
+    for surfs in frames.values():
+        for surf in surfs:
+            silhouette(surf)
+            silhouette(flip(surf, True, False))
@@ -1,4 +1,5 @@
 import pygame
+from settings import *
 from typing import Callable, Optional
 
 
@@ -15,16 +16,22 @@ class Transition:
         self.on_complete: Callable[[], None] = lambda: None
         self.alpha = 0.0
 
+        # after the midpoint, the screen stays black until load reports the next stage as ready
+        self.load: Callable[[float], bool] = lambda budget: True
+        self.loaded = True
+
         self.surface = pygame.Surface(self.screen.get_size())
         self.surface.fill((0, 0, 0))
         self.surface.set_alpha(0)
 
-    def start(self, on_midpoint: Callable[[], None], on_complete: Optional[Callable[[], None]] = None) -> None:
+    def start(self, on_midpoint: Callable[[], None], on_complete: Optional[Callable[[], None]] = None, load: Optional[Callable[[float], bool]] = None) -> None:
         self.time = 0.0
         self.active = True
         self.mid_triggered = False
         self.on_midpoint = on_midpoint
         self.on_complete = on_complete if on_complete else lambda: None
+        self.load = load if load else lambda budget: True
+        self.loaded = False
 
     def update(self, dt: float) -> None:
         if not self.active:
@@ -37,6 +44,12 @@ class Transition:
             self.mid_triggered = True
             self.on_midpoint()
 
+        # a slice of the loading every frame, the fade in waits for the last one
+        if self.mid_triggered and not self.loaded:
+            self.loaded = self.load(TRANSITION_LOAD_BUDGET)
+            if not self.loaded:
+                self.time = min(self.time, self.half_duration + 0.5)
+
         # End of transition
         if self.time >= self.duration:
             self.active = False